@@ -1,28 +1,46 @@
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, Blueprint, Request, request, jsonify, send_file, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 from flask_cors import CORS
-from ultralytics import YOLO
-import cv2
 import numpy as np
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 import base64
-import torch
-import database
+import uuid
+import time
+import csv
+import io
+import json
+import zipfile
+import config
+from model_registry import ModelRegistry, UnknownModelError
+from resolution import ResolutionController, letterbox_shape
+import inference_governor
+from inference_governor import InferenceGovernor, Overloaded
+from image_io import decode_image, DecodedImage, ImageTooLarge
+from near_duplicates import DuplicateIndex, perceptual_hash
+import frame_encoding
+import heatmap
+from events import EventBroker, ticket_stats_delta
+from memory_stats import EndpointMemory
+from rescore import RescoreJob
+from segmentation import load_yolo_weights, calculate_damage_area
 
-# Add Ultralytics classes to PyTorch safe globals (for PyTorch 2.6+)
-try:
-    from ultralytics.nn.tasks import SegmentationModel, DetectionModel
-    torch.serialization.add_safe_globals([SegmentationModel, DetectionModel])
-except Exception:
-    pass  # Older PyTorch versions don't need this
+if config.DATABASE_BACKEND == "sqlite":
+    import sqlite_database as database
+else:
+    import database
 
-# Initialize Flask
-app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend communication
+# NOTE: torch, ultralytics and cv2 are imported inside the functions that use
+# them. They take seconds to import, and auth / ticket routes never need them.
 
-# Initialize database
-database.init_db()
+# Routes are registered on a blueprint; create_app() builds the Flask app
+api = Blueprint("api", __name__)
+
+# Memory retained / peaked per endpoint, reported in /metrics
+endpoint_memory = EndpointMemory(config.MEMORY_STATS)
 
 # --------------------------
 # Configuration
@@ -43,150 +61,276 @@ MODELS_FOLDER.mkdir(exist_ok=True)
 # YOLO Model Path
 YOLO_PATH = MODELS_FOLDER / "bestyolov.pt"
 
-# Initialize model
-yolo_model = None
+# Name the default segmentation model is registered under
+DEFAULT_MODEL_NAME = "yolo"
+
+# Readiness of the model: "loading" -> "ready", or "unavailable" if it can't be loaded
+model_state = "loading"
 
 # Confidence threshold - Lower value = more detections (can detect weaker signals)
-# Try 0.1 for more sensitive detection, 0.5 for stricter detection
-CONF_THRESHOLD = 0.15  # Lowered from 0.25 for better detection
+# Set with CONF_THRESHOLD; sweep_settings.py shows what each value costs and gains
+CONF_THRESHOLD = config.YOLO_CONFIDENCE_THRESHOLD
+
+def _warmup(model):
+    """Run one dummy inference so the first real request doesn't pay setup costs"""
+    print(f"   Testing model inference...")
+    test_array = np.zeros((640, 640, 3), dtype=np.uint8)
+    _ = model.predict(test_array, verbose=False)
+    print(f"   ✅ Model is ready for inference!")
+
+# All loaded models / versions; requests use the active version unless they pin one
+registry = ModelRegistry(
+    loader=load_yolo_weights,
+    warmup=_warmup,
+    memory_budget_mb=config.MODEL_MEMORY_BUDGET_MB,
+    idle_seconds=config.MODEL_IDLE_SECONDS
+)
+
+# Picks 640 / 480 / 320 per request to stay within the latency target
+resolution_controller = ResolutionController(
+    sizes=config.INFERENCE_SIZES,
+    target_ms=config.LATENCY_TARGET_MS,
+    queue_depth_limit=config.RESOLUTION_QUEUE_DEPTH_LIMIT,
+    enabled=config.ADAPTIVE_RESOLUTION
+)
 
-def load_models():
+def default_weights_path():
+    """Weights for the configured MODEL_VARIANT (FP32 unless a promoted INT8 model exists)"""
+    if config.MODEL_VARIANT == "int8":
+        if config.INT8_MODEL_PATH.exists():
+            return config.INT8_MODEL_PATH
+        print(f"⚠️ MODEL_VARIANT=int8 but {config.INT8_MODEL_PATH} doesn't exist (run quantize_model.py)")
+        print(f"   Falling back to the FP32 model")
+    return YOLO_PATH
+
+# Bounds concurrent forward passes; camera frames jump ahead of uploads in the queue
+governor = InferenceGovernor(
+    max_inflight=config.MAX_CONCURRENT_INFERENCES,
+    max_queue=config.INFERENCE_QUEUE_SIZE,
+    queue_timeout=config.INFERENCE_QUEUE_TIMEOUT
+)
+
+def load_models(warmup=True):
     """Load YOLO segmentation model at startup"""
-    global yolo_model
+    global model_state
     
+    model_state = "loading"
+    weights_path = default_weights_path()
     try:
         # Load YOLO Segmentation Model
-        if YOLO_PATH.exists():
-            print(f"📦 Loading YOLO model from: {YOLO_PATH}")
-            yolo_model = YOLO(str(YOLO_PATH))
+        if weights_path.exists():
+            set_inference_threads(config.TORCH_THREADS)
+            entry = registry.load(DEFAULT_MODEL_NAME, weights_path, warmup=warmup)
             print(f"✅ Successfully loaded YOLO Segmentation model")
-            print(f"   Model task: {yolo_model.task}")
-            
-            # Test inference to ensure model works
-            print(f"   Testing model inference...")
-            test_array = np.zeros((640, 640, 3), dtype=np.uint8)
-            _ = yolo_model.predict(test_array, verbose=False)
-            print(f"   ✅ Model is ready for inference!")
+            print(f"   Model task: {entry.model.task}")
+            model_state = "ready"
         else:
+            model_state = "unavailable"
             print(f"⚠️ YOLO model not found at {YOLO_PATH}")
             print(f"   Please place your trained YOLO segmentation model at: {YOLO_PATH}")
             
     except Exception as e:
+        model_state = "unavailable"
         print(f"❌ Error loading model: {e}")
         print(f"   Tip: Make sure you have the latest ultralytics package:")
         print(f"   pip install --upgrade ultralytics")
 
+def warmup_model():
+    """Warm up every active model (e.g. in each worker after fork)"""
+    for entry in registry.active_models():
+        _warmup(entry.model)
+
+def load_for_inference(source):
+    """Decode an upload (bytes or saved path) at reduced scale when it's far larger than the model input"""
+    return decode_image(source, target_size=max(config.INFERENCE_SIZES), max_pixels=config.MAX_IMAGE_PIXELS)
+
+def requested_imgsz():
+    """Optional client cap on the inference size (e.g. imgsz=320 for a fast preview)
+
+    Raises ValueError when it isn't a positive integer (routes answer 400).
+    """
+    value = request.values.get("imgsz")
+    if not value and request.is_json:
+        value = (request.get_json(silent=True) or {}).get("imgsz")
+    if not value:
+        return None
+    try:
+        imgsz = int(value)
+    except (TypeError, ValueError):
+        imgsz = 0
+    if imgsz <= 0:
+        raise ValueError("imgsz must be a positive integer")
+    return imgsz
+
+def run_inference(model, image, conf, max_size=None, verbose=False):
+    """Predict at the adaptively chosen, rectangular letterboxed input shape
+
+    Returns the results and the (height, width) the model actually ran at.
+    """
+    size = resolution_controller.choose(queue_depth=governor.queued(), max_size=max_size)
+    imgsz = letterbox_shape(image.shape[0], image.shape[1], size)
+    started = time.perf_counter()
+    results = model.predict(image, conf=conf, imgsz=list(imgsz), verbose=verbose)
+    resolution_controller.record(size, time.perf_counter() - started)
+    return results, imgsz
+
+def requested_model():
+    """Model pin from the request ("name" or "name@version"); None means the default"""
+    spec = request.headers.get("X-Model") or request.values.get("model")
+    if not spec and request.is_json:
+        spec = (request.get_json(silent=True) or {}).get("model")
+    return spec or None
+
+def set_inference_threads(num_threads):
+    """Limit torch intra-op threads for this process (one budget per worker)"""
+    import torch
+    torch.set_num_threads(max(1, int(num_threads)))
+    print(f"🧵 Inference threads for pid {os.getpid()}: {torch.get_num_threads()}")
+
 # --------------------------
 # 2️⃣ Road Damage Assessment Logic
 # --------------------------
-def calculate_damage_area(masks, image_shape):
-    """Calculate total damage area from segmentation masks"""
-    if masks is None or len(masks) == 0:
-        return 0, 0, []
-    
-    total_area = 0
-    image_area = image_shape[0] * image_shape[1]
-    mask_areas = []
-    
-    # Convert masks to numpy if needed
-    masks_np = masks.data.cpu().numpy() if hasattr(masks, 'data') else masks
-    
-    for mask in masks_np:
-        # Convert to binary mask
-        binary_mask = (mask > 0).astype(np.uint8) * 255
-        
-        # Find contours
-        contours, _ = cv2.findContours(binary_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            # Calculate area of the largest contour
-            area = cv2.contourArea(contours[0])
-            mask_areas.append(area)
-            total_area += area
-    
-    percentage_damage = (total_area / image_area) * 100 if image_area > 0 else 0
-    
-    return total_area, percentage_damage, mask_areas
+def assess_result(result, decoded, model_key, imgsz, verbose=True):
+    """Damage stats for one inference result, saving the annotated image
 
-def segment_and_assess(img_path, conf=CONF_THRESHOLD):
-    """Perform segmentation and damage assessment"""
-    if yolo_model is None:
-        return None, None, {}
-    
-    # Run YOLO segmentation with lower confidence and show boxes temporarily for debugging
-    print(f"🔍 Running inference with confidence: {conf}")
-    results = yolo_model.predict(str(img_path), conf=conf, imgsz=640, verbose=True)
+    Returns (annotated output filename, damage stats).
+    """
+    import cv2
     
     # Debug: Print detection info
-    print(f"📊 Detection Results:")
-    print(f"   - Boxes detected: {len(results[0].boxes) if results[0].boxes is not None else 0}")
-    print(f"   - Masks detected: {len(results[0].masks) if results[0].masks is not None else 0}")
-    
-    if results[0].boxes is not None and len(results[0].boxes) > 0:
-        print(f"   - Classes: {results[0].boxes.cls.tolist() if hasattr(results[0].boxes, 'cls') else 'N/A'}")
-        print(f"   - Confidences: {results[0].boxes.conf.tolist() if hasattr(results[0].boxes, 'conf') else 'N/A'}")
-    
-    # Read original image
-    img = cv2.imread(str(img_path))
+    if verbose:
+        print(f"📊 Detection Results:")
+        print(f"   - Boxes detected: {len(result.boxes) if result.boxes is not None else 0}")
+        print(f"   - Masks detected: {len(result.masks) if result.masks is not None else 0}")
+        
+        if result.boxes is not None and len(result.boxes) > 0:
+            print(f"   - Classes: {result.boxes.cls.tolist() if hasattr(result.boxes, 'cls') else 'N/A'}")
+            print(f"   - Confidences: {result.boxes.conf.tolist() if hasattr(result.boxes, 'conf') else 'N/A'}")
     
     # Get annotated image - show boxes AND masks for better visibility
-    annotated_img = results[0].plot(boxes=True, conf=True, labels=True)
+    annotated_img = result.plot(boxes=True, conf=True, labels=True)
     
-    # Calculate damage statistics
+    # Calculate damage statistics (areas reported in original-image pixels)
     damage_stats = {
+        "model": model_key,
+        "inference_size": list(imgsz),
+        "decode_reduction": decoded.reduction,
         "total_detections": 0,
         "total_damaged_area": 0,
         "percentage_damage": 0.0,
         "individual_areas": [],
         "image_dimensions": {
-            "width": img.shape[1],
-            "height": img.shape[0],
-            "total_pixels": img.shape[0] * img.shape[1]
+            "width": decoded.original_width,
+            "height": decoded.original_height,
+            "total_pixels": decoded.original_width * decoded.original_height
         }
     }
     
-    if results[0].masks is not None:
-        print(f"✅ Processing {len(results[0].masks)} masks...")
+    if result.masks is not None:
+        if verbose:
+            print(f"✅ Processing {len(result.masks)} masks...")
         total_area, percentage_damage, mask_areas = calculate_damage_area(
-            results[0].masks, img.shape
+            result.masks, decoded.pixels.shape
         )
+        total_area *= decoded.area_scale
+        mask_areas = [area * decoded.area_scale for area in mask_areas]
         
         damage_stats.update({
-            "total_detections": len(results[0].masks),
+            "total_detections": len(result.masks),
             "total_damaged_area": int(total_area),
             "percentage_damage": round(percentage_damage, 2),
             "individual_areas": [int(area) for area in mask_areas]
         })
-        print(f"   - Total area: {total_area} pixels")
-        print(f"   - Damage: {percentage_damage:.2f}%")
-    else:
+        if verbose:
+            print(f"   - Total area: {total_area} pixels")
+            print(f"   - Damage: {percentage_damage:.2f}%")
+    elif verbose:
         print(f"⚠️ No masks detected in image")
     
     # Save annotated output
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    out_filename = f"pred_{timestamp}.jpg"
+    out_filename = f"pred_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
     out_path = OUTPUT_FOLDER / out_filename
     cv2.imwrite(str(out_path), annotated_img)
-    print(f"💾 Saved result to: {out_path}")
+    if verbose:
+        print(f"💾 Saved result to: {out_path}")
+    
+    return out_filename, damage_stats
+
+def segment_and_assess(img_path, conf=CONF_THRESHOLD, model_spec=None, max_size=None,
+                       priority=inference_governor.UPLOAD):
+    """Perform segmentation and damage assessment (img_path may also be an already decoded image)
+
+    Returns (annotated output filename, damage stats). The ultralytics Results
+    and the annotated image are released before returning.
+    """
+    if not registry.has_active():
+        return None, None
+    
+    # Read image, decoded at 1/2, 1/4 or 1/8 scale if it's much larger than the model input
+    decoded = img_path if isinstance(img_path, DecodedImage) else load_for_inference(img_path)
+    
+    # Run YOLO segmentation with lower confidence and show boxes temporarily for debugging
+    with governor.slot(priority), registry.use(model_spec) as entry:
+        print(f"🔍 Running inference with {entry.key}, confidence: {conf}")
+        results, imgsz = run_inference(entry.model, decoded.pixels, conf, max_size=max_size, verbose=True)
     
-    return out_filename, damage_stats, results[0]
+    out_filename, damage_stats = assess_result(results[0], decoded, entry.key, imgsz)
+    
+    # Drop the large intermediates now (Results holds orig_img and mask tensors)
+    del results
+    
+    return out_filename, damage_stats
+
+def segment_and_assess_batch(images, conf=CONF_THRESHOLD, model_spec=None,
+                             priority=inference_governor.BULK):
+    """Batched segmentation + assessment for bulk jobs
+
+    images is a list of DecodedImage. Images with the same letterboxed input
+    shape share one forward pass of up to BULK_BATCH_SIZE images, which takes
+    one inference slot. Runs at the full inference size; the adaptive
+    resolution is left to interactive traffic. Returns one
+    (annotated output filename, damage stats) or exception per image, in order.
+    """
+    if not registry.has_active():
+        return [(None, None)] * len(images)
+    
+    size = max(config.INFERENCE_SIZES)
+    groups = {}
+    for i, decoded in enumerate(images):
+        shape = letterbox_shape(decoded.pixels.shape[0], decoded.pixels.shape[1], size)
+        groups.setdefault(shape, []).append(i)
+    
+    outcomes = [None] * len(images)
+    for imgsz, indices in groups.items():
+        for start in range(0, len(indices), config.BULK_BATCH_SIZE):
+            batch = indices[start:start + config.BULK_BATCH_SIZE]
+            try:
+                with governor.slot(priority), registry.use(model_spec) as entry:
+                    print(f"🔍 Running batch of {len(batch)} with {entry.key} at {imgsz[1]}x{imgsz[0]}, confidence: {conf}")
+                    results = entry.model.predict([images[i].pixels for i in batch], conf=conf,
+                                                  imgsz=list(imgsz), verbose=False)
+                for i, result in zip(batch, results):
+                    outcomes[i] = assess_result(result, images[i], entry.key, imgsz, verbose=False)
+                del results
+            except Exception as e:
+                for i in batch:
+                    outcomes[i] = e
+    return outcomes
 
 # --------------------------
 # 3️⃣ Real-time Camera Processing
 # --------------------------
-def process_frame(frame):
-    """Process a single frame from camera"""
-    if yolo_model is None:
-        return frame, {}
-    
-    # Run inference
-    results = yolo_model.predict(frame, conf=CONF_THRESHOLD, imgsz=640, verbose=False)
-    
-    # Get annotated frame
-    annotated_frame = results[0].plot(boxes=False)
+def detect_frame(frame, model_spec=None, max_size=None):
+    """Run inference on a camera frame; returns the result and damage stats"""
+    # Run inference (camera frames are served ahead of uploads)
+    with governor.slot(inference_governor.REALTIME), registry.use(model_spec) as entry:
+        results, imgsz = run_inference(entry.model, frame, CONF_THRESHOLD, max_size=max_size)
     
     # Calculate damage
     damage_stats = {
+        "model": entry.key,
+        "inference_size": list(imgsz),
         "total_detections": 0,
         "percentage_damage": 0.0
     }
@@ -198,6 +342,19 @@ def process_frame(frame):
             "percentage_damage": round(percentage_damage, 2)
         })
     
+    return results[0], damage_stats
+
+def process_frame(frame, model_spec=None, max_size=None):
+    """Process a single frame from camera"""
+    import cv2
+    if not registry.has_active():
+        return frame, {}
+    
+    result, damage_stats = detect_frame(frame, model_spec, max_size)
+    
+    # Get annotated frame
+    annotated_frame = result.plot(boxes=False)
+    
     # Add text overlay
     text = f"Road Damage: {damage_stats['percentage_damage']:.2f}%"
     font = cv2.FONT_HERSHEY_SIMPLEX
@@ -221,27 +378,60 @@ def process_frame(frame):
 # --------------------------
 # 4️⃣ Flask Routes
 # --------------------------
-@app.route("/")
+@api.route("/")
 def home():
     return jsonify({
         "message": "✅ Road Damage Segmentation API Running!",
         "version": "2.0.0",
-        "model_loaded": yolo_model is not None,
+        "model_loaded": registry.has_active(),
         "task": "segmentation",
         "features": ["image_upload", "camera_capture", "damage_assessment"]
     })
 
-@app.route("/health")
+@api.route("/health")
 def health():
+    """Liveness: the process is up. `state` reports model readiness (loading / ready / unavailable)"""
     return jsonify({
         "status": "healthy",
-        "model_loaded": yolo_model is not None,
-        "model_task": yolo_model.task if yolo_model else None
+        "state": model_state,
+        "model_loaded": registry.has_active(),
+        "model_task": registry.get().model.task if registry.has_active() else None
     })
 
-@app.route("/predict", methods=["POST"])
+@api.route("/health/ready")
+def health_ready():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    return jsonify({"state": model_state}), 200 if model_state == "ready" else 503
+
+def overloaded_response(error):
+    """Fast 429 / 503 with Retry-After when inference capacity is exhausted"""
+    response = jsonify({"success": False, "error": str(error)})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status_code
+
+@api.app_errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    """Bodies over MAX_CONTENT_LENGTH are refused from the Content-Length header, before being read"""
+    return jsonify({
+        "success": False,
+        "error": f"Request body too large (limit {request.max_content_length // (1024 * 1024)} MB)"
+    }), 413
+
+def model_unavailable_response():
+    """503 for model routes while the model is still loading (or missing)"""
+    if model_state == "loading":
+        response = jsonify({"success": False, "error": "Model is loading, please retry shortly", "state": model_state})
+        response.headers["Retry-After"] = "5"
+    else:
+        response = jsonify({"success": False, "error": "Model not available", "state": model_state})
+    return response, 503
+
+@api.route("/predict", methods=["POST"])
 def predict():
     """Handle image upload and segmentation"""
+    if model_state != "ready":
+        return model_unavailable_response()
+    
     if "image" not in request.files:
         return jsonify({"error": "No image uploaded"}), 400
     
@@ -250,6 +440,11 @@ def predict():
     if img_file.filename == "":
         return jsonify({"error": "No image selected"}), 400
     
+    try:
+        imgsz = requested_imgsz()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
     try:
         # Save uploaded file
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -261,7 +456,7 @@ def predict():
         conf = float(request.form.get('confidence', CONF_THRESHOLD))
         
         # Run segmentation and assessment
-        out_filename, damage_stats, results = segment_and_assess(temp_path, conf)
+        out_filename, damage_stats = segment_and_assess(temp_path, conf, requested_model(), imgsz)
         
         return jsonify({
             "success": True,
@@ -270,6 +465,12 @@ def predict():
             **damage_stats
         })
     
+    except UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except ImageTooLarge as e:
+        return jsonify({"success": False, "error": str(e)}), 413
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"Error in prediction: {e}")
         return jsonify({
@@ -277,28 +478,69 @@ def predict():
             "error": str(e)
         }), 500
 
-@app.route("/predict_frame", methods=["POST"])
+@api.route("/predict_frame", methods=["POST"])
 def predict_frame():
     """Handle single frame prediction from camera"""
+    import cv2
+    if model_state != "ready":
+        return model_unavailable_response()
+    
     try:
         # Get image data from request
         if "image" in request.files:
             img_file = request.files["image"]
             # Read image
-            file_bytes = np.frombuffer(img_file.read(), np.uint8)
-            frame = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        elif "frame" in request.json:
+            img_data = img_file.read()
+        elif request.is_json and "frame" in request.json:
             # Base64 encoded frame
             frame_data = request.json["frame"]
             # Decode base64
-            img_data = base64.b64decode(frame_data.split(',')[1] if ',' in frame_data else frame_data)
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            try:
+                img_data = base64.b64decode(frame_data.split(',')[1] if ',' in frame_data else frame_data)
+            except (TypeError, ValueError):  # not a string / binascii.Error
+                return jsonify({"success": False, "error": "frame is not valid base64"}), 400
         else:
             return jsonify({"error": "No image data provided"}), 400
+        if not img_data:
+            return jsonify({"success": False, "error": "Empty image data"}), 400
+        
+        # output=json / output=binary: detections only, the client draws the overlay
+        output = request.values.get("output") or (request.json.get("output") if request.is_json else None) or "image"
+        if output not in ("image", "json", "binary"):
+            return jsonify({"success": False, "error": "output must be image, json or binary"}), 400
+        try:
+            imgsz = requested_imgsz()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        try:
+            decoded = load_for_inference(img_data)
+        except ImageTooLarge as e:
+            return jsonify({"success": False, "error": str(e)}), 413
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        frame = decoded.pixels
+        if output == "binary" and max(decoded.original_width, decoded.original_height) > frame_encoding.MAX_BINARY_SIZE:
+            return jsonify({"success": False,
+                            "error": f"output=binary supports frames up to {frame_encoding.MAX_BINARY_SIZE} px, use output=json"}), 400
+        
+        if output != "image":
+            result, damage_stats = detect_frame(frame, requested_model(), imgsz)
+            width, height = decoded.original_width, decoded.original_height
+            detections = frame_encoding.extract_detections(
+                result, decoded.scale_x, decoded.scale_y, width, height)
+            if output == "binary":
+                payload = frame_encoding.encode_binary(detections, width, height, damage_stats["percentage_damage"])
+                return Response(payload, mimetype="application/octet-stream",
+                                headers={"X-Model": damage_stats["model"]})
+            return jsonify({
+                "success": True,
+                **damage_stats,
+                **frame_encoding.encode_json(detections, width, height, damage_stats["percentage_damage"])
+            })
         
         # Process frame
-        annotated_frame, damage_stats = process_frame(frame)
+        annotated_frame, damage_stats = process_frame(frame, requested_model(), imgsz)
         
         # Encode result as base64
         _, buffer = cv2.imencode('.jpg', annotated_frame)
@@ -310,6 +552,10 @@ def predict_frame():
             **damage_stats
         })
     
+    except UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"Error processing frame: {e}")
         return jsonify({
@@ -317,7 +563,7 @@ def predict_frame():
             "error": str(e)
         }), 500
 
-@app.route("/outputs/<filename>")
+@api.route("/outputs/<filename>")
 def get_output(filename):
     """Serve annotated output images"""
     path = OUTPUT_FOLDER / filename
@@ -325,22 +571,127 @@ def get_output(filename):
         return jsonify({"error": "File not found"}), 404
     return send_file(str(path), mimetype="image/jpeg")
 
-@app.route("/models/info")
+@api.route("/models/info")
 def models_info():
-    """Get information about loaded model"""
+    """Get information about loaded models (memory footprint and latency per version)"""
+    default = registry.get() if registry.has_active() else None
     return jsonify({
         "yolo": {
-            "loaded": yolo_model is not None,
-            "path": str(YOLO_PATH) if YOLO_PATH.exists() else None,
-            "task": yolo_model.task if yolo_model else None
+            "loaded": default is not None,
+            "path": default.path if default else None,
+            "task": default.model.task if default else None,
+            "version": default.version if default else None,
+            "variant": "int8" if default and default.path == str(config.INT8_MODEL_PATH) else "fp32"
         },
+        "registry": registry.info(),
         "confidence_threshold": CONF_THRESHOLD
     })
 
+@api.route("/metrics")
+def metrics():
+    """Serving metrics: inference resolution and latency"""
+    return jsonify({
+        "inference": resolution_controller.stats(),
+        "admission": governor.stats(),
+        "memory": endpoint_memory.stats()
+    })
+
+@api.route("/models/load", methods=["POST"])
+def models_load():
+    """Load new weights in the background and (optionally) switch traffic to them (admin only)"""
+    data = request.json
+    token = data.get('token')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success or user['role'] != 'admin':
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    
+    name = data.get('name', DEFAULT_MODEL_NAME)
+    if not data.get('path'):
+        return jsonify({"success": False, "error": "Model path required"}), 400
+    
+    # Only weights inside the models folder may be loaded
+    path = (MODELS_FOLDER / data['path']).resolve()
+    if MODELS_FOLDER.resolve() not in path.parents or not path.is_file():
+        return jsonify({"success": False, "error": "Model file not found in models folder"}), 400
+    
+    version = registry.load_async(name, path, version=data.get('version'),
+                                  activate=data.get('activate', True))
+    return jsonify({"success": True, "model": f"{name}@{version}", "status": "loading"}), 202
+
+@api.route("/models/activate", methods=["POST"])
+def models_activate():
+    """Switch traffic to an already loaded model version (admin only)"""
+    data = request.json
+    token = data.get('token')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success or user['role'] != 'admin':
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    
+    try:
+        registry.activate(data.get('name', DEFAULT_MODEL_NAME), data.get('version'))
+    except UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    return jsonify({"success": True})
+
+# Re-scores stored tickets after a model upgrade (see rescore.py)
+rescore_job = RescoreJob(
+    config.RESCORE_CHECKPOINT,
+    registry=registry,
+    score_batch=segment_and_assess_batch,
+    load_image=load_for_inference,
+    database=database,
+    heatmap=heatmap,
+    output_folder=OUTPUT_FOLDER,
+    conf=CONF_THRESHOLD,
+    batch_size=config.BULK_BATCH_SIZE,
+    max_per_second=config.RESCORE_MAX_PER_SECOND
+)
+
+@api.route("/models/rescore", methods=["GET"])
+def models_rescore_status():
+    """Progress of the ticket re-scoring job"""
+    return jsonify({"success": True, "rescore": rescore_job.status()})
+
+@api.route("/models/rescore", methods=["POST"])
+def models_rescore():
+    """Start (or stop) re-scoring stored tickets with the active model version (admin only)"""
+    data = request.json
+    token = data.get('token')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success or user['role'] != 'admin':
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    
+    if data.get('action') == 'stop':
+        rescore_job.stop()
+        return jsonify({"success": True, "rescore": rescore_job.status()})
+    
+    if not registry.has_active():
+        return model_unavailable_response()
+    try:
+        registry.resolve(data.get('model'))
+    except UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    if not rescore_job.start(data.get('model'), restart=bool(data.get('restart'))):
+        return jsonify({"success": False, "error": "A re-score job is already running",
+                        "rescore": rescore_job.status()}), 409
+    return jsonify({"success": True, "rescore": rescore_job.status()}), 202
+
 # --------------------------
 # 5️⃣ Authentication & User Management Routes
 # --------------------------
-@app.route("/api/register", methods=["POST"])
+@api.route("/api/register", methods=["POST"])
 def register():
     """Register a new user"""
     data = request.json
@@ -363,7 +714,7 @@ def register():
     else:
         return jsonify({"success": False, "error": "Username or email already exists"}), 400
 
-@app.route("/api/login", methods=["POST"])
+@api.route("/api/login", methods=["POST"])
 def login():
     """Login user"""
     data = request.json
@@ -383,7 +734,7 @@ def login():
     else:
         return jsonify({"success": False, "error": "Invalid credentials"}), 401
 
-@app.route("/api/verify", methods=["POST"])
+@api.route("/api/verify", methods=["POST"])
 def verify():
     """Verify session token"""
     data = request.json
@@ -401,7 +752,49 @@ def verify():
 # --------------------------
 # 6️⃣ Ticket Management Routes
 # --------------------------
-@app.route("/api/tickets/create", methods=["POST"])
+duplicate_index = DuplicateIndex(
+    max_distance=config.DEDUP_MAX_DISTANCE,
+    radius_m=config.DEDUP_RADIUS_M,
+    window_days=config.DEDUP_WINDOW_DAYS,
+)
+
+def find_duplicate(image_phash, latitude, longitude, location):
+    """Recent original ticket with a near-identical photo at the same place, plus hash distance"""
+    # Picks up tickets filed by other workers (and fills the index on first use)
+    duplicate_index.sync(database.get_hashed_tickets, every_seconds=config.DEDUP_SYNC_SECONDS)
+    duplicate, distance = duplicate_index.find(image_phash, latitude, longitude, location)
+    if duplicate:
+        # The index may predate a re-score: reuse the ticket's current analysis
+        current = database.get_ticket_by_id(duplicate["id"])
+        if not current or not current.get("annotated_image_path"):
+            return None, None
+        duplicate = dict(duplicate, **{key: current.get(key) for key in (
+            "annotated_image_path", "damage_percentage", "total_damaged_area", "total_detections")})
+    return duplicate, distance
+
+def duplicate_damage_data(duplicate, distance):
+    """damage_data of a ticket that reuses the analysis of `duplicate` (from find_duplicate)"""
+    return {
+        "percentage_damage": duplicate.get("damage_percentage") or 0,
+        "total_damaged_area": duplicate.get("total_damaged_area") or 0,
+        "total_detections": duplicate.get("total_detections") or 0,
+        "duplicate_of": duplicate["id"],
+        "hash_distance": distance,
+    }
+
+def index_for_duplicates(ticket_id, image_phash, latitude, longitude, location, annotated_image_path, damage_data):
+    """Make a new original ticket findable by find_duplicate() in this worker right away"""
+    damage_data = damage_data or {}
+    duplicate_index.add({
+        "id": ticket_id, "image_phash": image_phash, "created_at": datetime.now(),
+        "latitude": latitude, "longitude": longitude, "location": location,
+        "annotated_image_path": annotated_image_path,
+        "damage_percentage": damage_data.get("percentage_damage", 0),
+        "total_damaged_area": damage_data.get("total_damaged_area", 0),
+        "total_detections": damage_data.get("total_detections", 0),
+    })
+
+@api.route("/api/tickets/create", methods=["POST"])
 def create_ticket():
     """Create a new damage ticket"""
     # Verify authentication
@@ -427,6 +820,19 @@ def create_ticket():
     image_path = None
     annotated_image_path = None
     damage_data = None
+    image_phash = None
+    duplicate = None
+    
+    try:
+        latitude = float(latitude) if latitude else None
+        longitude = float(longitude) if longitude else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid coordinates"}), 400
+    
+    try:
+        imgsz = requested_imgsz()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
     if 'image' in request.files:
         img_file = request.files['image']
@@ -442,13 +848,29 @@ def create_ticket():
                 # Get confidence threshold
                 conf = float(request.form.get('confidence', CONF_THRESHOLD))
                 
-                # Run analysis
-                out_filename, damage_stats, results = segment_and_assess(temp_path, conf)
+                decoded = load_for_inference(temp_path)
+                
+                # A near-identical recent photo of the same spot reuses that ticket's analysis
+                if config.DEDUP_ENABLED:
+                    image_phash = perceptual_hash(decoded.pixels)
+                    duplicate, distance = find_duplicate(image_phash, latitude, longitude, location)
+                
+                if duplicate:
+                    print(f"♻️ Photo matches ticket {duplicate['id']} ({distance} bits apart), reusing its analysis")
+                    annotated_image_path = duplicate.get("annotated_image_path")
+                    damage_data = duplicate_damage_data(duplicate, distance)
+                else:
+                    # Run analysis
+                    out_filename, damage_stats = segment_and_assess(decoded, conf, requested_model(), imgsz)
+                    annotated_image_path = out_filename
+                    damage_data = damage_stats
+                del decoded  # the database write and events don't need the pixels
                 
                 image_path = str(temp_path)
-                annotated_image_path = out_filename
-                damage_data = damage_stats
                 
+            except Overloaded as e:
+                # Don't file the ticket without its analysis; the client retries
+                return overloaded_response(e)
             except Exception as e:
                 print(f"Error analyzing image: {e}")
     
@@ -462,20 +884,236 @@ def create_ticket():
             image_path,
             annotated_image_path,
             damage_data,
-            float(latitude) if latitude else None,
-            float(longitude) if longitude else None
+            latitude,
+            longitude,
+            image_phash=image_phash,
+            duplicate_of=duplicate["id"] if duplicate else None
         )
         
+        if ticket_id:
+            if image_phash and annotated_image_path and not duplicate:
+                index_for_duplicates(ticket_id, image_phash, latitude, longitude, location,
+                                     annotated_image_path, damage_data)
+            ticket_changed("ticket_created", ticket_id)
+        
         return jsonify({
             "success": True,
             "ticket_id": ticket_id,
+            "duplicate_of": duplicate["id"] if duplicate else None,
             "damage_data": damage_data
         })
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route("/api/tickets/my", methods=["POST"])
+IMPORT_CHUNK_ITEMS = 32  # images decoded and held in memory at once during an import
+IMPORT_MANIFEST_MAX_MB = 16  # tickets.json inside an archive (IMPORT_MAX_ITEMS need far less)
+
+def read_import_items():
+    """Ticket items of an import request plus a function reading an item's image bytes
+
+    Accepts a zip `archive` holding tickets.json and the images, or a
+    `tickets` JSON field with the images as `images` files (matched by filename).
+    """
+    if 'archive' in request.files:
+        try:
+            archive = zipfile.ZipFile(request.files['archive'].stream)
+            manifest = archive.getinfo("tickets.json")
+        except (zipfile.BadZipFile, KeyError):
+            raise ValueError("Archive must be a zip file containing tickets.json")
+        # Sizes are checked before inflating anything (a small archive can expand enormously)
+        if manifest.file_size > IMPORT_MANIFEST_MAX_MB * 1024 * 1024:
+            raise ValueError(f"tickets.json larger than {IMPORT_MANIFEST_MAX_MB} MB")
+        try:
+            items = json.loads(archive.read(manifest))
+        except (zipfile.BadZipFile, ValueError):
+            raise ValueError("Archive must be a zip file containing tickets.json")
+        members = {info.filename: info for info in archive.infolist()}
+        
+        def read_image(name):
+            info = members.get(name)
+            if info is None:
+                return None
+            if info.file_size > config.MAX_UPLOAD_MB * 1024 * 1024:
+                raise ValueError(f"Image larger than {config.MAX_UPLOAD_MB} MB")
+            return archive.read(info)
+    else:
+        try:
+            items = json.loads(request.form.get('tickets') or "")
+        except ValueError:
+            raise ValueError("tickets must be a JSON list")
+        files = {f.filename: f for f in request.files.getlist('images')}
+        
+        def read_image(name):
+            image = files.get(name)
+            return image.read() if image else None
+    
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("tickets must be a JSON list of objects")
+    return items, read_image
+
+def prepare_import_item(item, read_image, user_id):
+    """Validate one import item and decode its photo
+
+    Returns (ticket fields, decoded image, image bytes). Nothing is written
+    yet: save_import_upload() stores the photo once the ticket is going to be
+    created.
+    """
+    if not all(item.get(field) for field in ('title', 'description', 'location')):
+        raise ValueError("Missing required fields")
+    try:
+        latitude = float(item['latitude']) if item.get('latitude') not in (None, "") else None
+        longitude = float(item['longitude']) if item.get('longitude') not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("Invalid coordinates")
+    name = str(item.get('image') or "")
+    if not name:
+        raise ValueError("Image required")
+    data = read_image(name)
+    if data is None:
+        raise ValueError(f"Image {name} not found in the upload")
+    decoded = load_for_inference(data)
+    
+    # Named like the uploads of /api/tickets/create
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"ticket_{user_id}_{timestamp}_{uuid.uuid4().hex[:8]}_{secure_filename(Path(name).name)}"
+    
+    fields = {
+        "user_id": user_id,
+        "title": item['title'],
+        "description": item['description'],
+        "location": item['location'],
+        "latitude": latitude,
+        "longitude": longitude,
+        "image_path": str(UPLOAD_FOLDER / filename),
+    }
+    return fields, decoded, data
+
+def save_import_upload(fields, data):
+    """Store an import item's photo at fields["image_path"]; the error text on failure"""
+    try:
+        Path(fields["image_path"]).write_bytes(data)
+        return None
+    except OSError as e:
+        print(f"⚠️ Could not save {fields['image_path']}: {e}")
+        return "Image could not be saved"
+
+def discard_import_files(fields, duplicate):
+    """Remove the photo and annotated output of an import item that wasn't created"""
+    paths = [Path(fields["image_path"])]
+    if fields.get("annotated_image_path") and not duplicate:
+        paths.append(OUTPUT_FOLDER / fields["annotated_image_path"])
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"⚠️ Could not remove {path}: {e}")
+
+@api.route("/api/tickets/import", methods=["POST"])
+def import_tickets():
+    """Create many tickets from one upload (e.g. a survey vehicle run)"""
+    token = request.form.get('token') or request.headers.get('Authorization')
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success:
+        return jsonify({"success": False, "error": "Invalid session"}), 401
+    
+    try:
+        items, read_image = read_import_items()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if len(items) > config.IMPORT_MAX_ITEMS:
+        return jsonify({"success": False, "error": f"At most {config.IMPORT_MAX_ITEMS} tickets per import"}), 400
+    
+    try:
+        conf = float(request.form.get('confidence', CONF_THRESHOLD))
+    except ValueError:
+        conf = -1.0
+    if not 0.0 <= conf <= 1.0:
+        return jsonify({"success": False, "error": "confidence must be a number between 0 and 1"}), 400
+    model_spec = requested_model()
+    started = time.perf_counter()
+    results = [{"index": i, "success": False} for i in range(len(items))]
+    
+    for chunk_start in range(0, len(items), IMPORT_CHUNK_ITEMS):
+        chunk = range(chunk_start, min(chunk_start + IMPORT_CHUNK_ITEMS, len(items)))
+        
+        # Validate and decode; near-identical recent photos reuse the earlier analysis
+        prepared = []  # (index, ticket fields, decoded image, image bytes, duplicate)
+        for i in chunk:
+            try:
+                fields, decoded, data = prepare_import_item(items[i], read_image, user['user_id'])
+            except (ValueError, ImageTooLarge) as e:
+                results[i]["error"] = str(e)
+                continue
+            duplicate = None
+            if config.DEDUP_ENABLED:
+                fields["image_phash"] = perceptual_hash(decoded.pixels)
+                duplicate, distance = find_duplicate(fields["image_phash"], fields["latitude"],
+                                                     fields["longitude"], fields["location"])
+            if duplicate:
+                fields["annotated_image_path"] = duplicate.get("annotated_image_path")
+                fields["duplicate_of"] = duplicate["id"]
+                fields["damage_data"] = duplicate_damage_data(duplicate, distance)
+            prepared.append((i, fields, decoded, data, duplicate))
+        
+        # Batched inference for the rest, behind live and interactive traffic
+        to_analyze = [entry for entry in prepared if not entry[4]]
+        outcomes = segment_and_assess_batch([entry[2] for entry in to_analyze], conf, model_spec)
+        for (i, fields, _, _, duplicate), outcome in zip(to_analyze, outcomes):
+            if isinstance(outcome, Overloaded):
+                results[i]["error"] = "Server busy, retry this ticket"
+            elif isinstance(outcome, Exception):
+                results[i]["error"] = f"Analysis failed: {outcome}"
+            else:
+                fields["annotated_image_path"], fields["damage_data"] = outcome
+        
+        # Only items that passed validation and analysis get their photo stored
+        tickets = []
+        for i, fields, _, data, duplicate in prepared:
+            if "error" not in results[i]:
+                error = save_import_upload(fields, data)
+                if not error:
+                    tickets.append((i, fields, duplicate))
+                    continue
+                results[i]["error"] = error
+            discard_import_files(fields, duplicate)
+        del prepared, to_analyze  # release the decoded pixels and bytes of this chunk
+        
+        # One unordered bulk write per chunk; failures are reported per item
+        ids = database.create_tickets([fields for _, fields, _ in tickets])
+        created = []
+        for (i, fields, duplicate), ticket_id in zip(tickets, ids):
+            if not ticket_id:
+                results[i]["error"] = "Ticket could not be saved"
+                discard_import_files(fields, duplicate)
+                continue
+            results[i].update({
+                "success": True,
+                "ticket_id": ticket_id,
+                "duplicate_of": duplicate["id"] if duplicate else None,
+                "damage_percentage": (fields.get("damage_data") or {}).get("percentage_damage", 0),
+            })
+            if fields.get("image_phash") and fields.get("annotated_image_path") and not duplicate:
+                index_for_duplicates(ticket_id, fields["image_phash"], fields["latitude"], fields["longitude"],
+                                     fields["location"], fields["annotated_image_path"], fields.get("damage_data"))
+            created.append(ticket_id)
+        
+        # Heatmap and dashboard events for the whole chunk at once
+        tickets_changed("ticket_created", created)
+    
+    imported = sum(result["success"] for result in results)
+    print(f"📦 Imported {imported}/{len(items)} tickets in {time.perf_counter() - started:.1f}s")
+    return jsonify({
+        "success": True,
+        "imported": imported,
+        "failed": len(items) - imported,
+        "results": results
+    })
+
+@api.route("/api/tickets/my", methods=["POST"])
 def get_my_tickets():
     """Get user's tickets"""
     data = request.json
@@ -488,10 +1126,12 @@ def get_my_tickets():
     if not success:
         return jsonify({"success": False, "error": "Invalid session"}), 401
     
+    # Events after this cursor are not reflected in the list (see /api/events/stream)
+    cursor = event_cursor()
     tickets = database.get_user_tickets(user['user_id'])
-    return jsonify({"success": True, "tickets": tickets})
+    return jsonify({"success": True, "tickets": tickets, "cursor": cursor})
 
-@app.route("/api/tickets/all", methods=["POST"])
+@api.route("/api/tickets/all", methods=["POST"])
 def get_all_tickets_admin():
     """Get all tickets (admin only)"""
     data = request.json
@@ -504,10 +1144,152 @@ def get_all_tickets_admin():
     if not success or user['role'] != 'admin':
         return jsonify({"success": False, "error": "Admin access required"}), 403
     
+    cursor = event_cursor()
     tickets = database.get_all_tickets()
-    return jsonify({"success": True, "tickets": tickets})
+    return jsonify({"success": True, "tickets": tickets, "cursor": cursor})
+
+EXPORT_FIELDS = [
+    "id", "created_at", "updated_at", "status", "priority", "title", "description",
+    "location", "latitude", "longitude", "damage_percentage", "total_damaged_area",
+    "total_detections", "admin_notes", "duplicate_of", "model_version", "user_id", "username", "email", "full_name",
+    "phone", "image_path", "annotated_image_path",
+]
+EXPORT_CHUNK_ROWS = 500
+
+def parse_export_date(value, end=False):
+    """ISO date/datetime query param -> datetime; a bare end date includes that whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def export_rows(tickets, fmt):
+    """Encode tickets as NDJSON or CSV text, yielding a chunk every EXPORT_CHUNK_ROWS tickets"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue()  # first bytes go out before the query returns anything
+        buffer.seek(0)
+        buffer.truncate()
+    
+    rows = 0
+    for ticket in tickets:
+        if writer:
+            writer.writerow(ticket)
+        else:
+            buffer.write(json.dumps({field: ticket.get(field) for field in EXPORT_FIELDS}, default=str))
+            buffer.write("\n")
+        rows += 1
+        if rows == 1 or rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@api.route("/api/tickets/export", methods=["GET"])
+def export_tickets():
+    """Stream tickets as NDJSON or CSV (admin only)"""
+    token = request.args.get('token') or request.headers.get('Authorization')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success or user['role'] != 'admin':
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"success": False, "error": "format must be ndjson or csv"}), 400
+    
+    try:
+        start = parse_export_date(request.args.get('start'))
+        end = parse_export_date(request.args.get('end'), end=True)
+    except ValueError:
+        return jsonify({"success": False, "error": "start/end must be ISO dates (YYYY-MM-DD)"}), 400
+    
+    # Comma-separated lists, e.g. status=pending,in_progress
+    statuses = [v for v in request.args.get('status', '').split(',') if v] or None
+    priorities = [v for v in request.args.get('priority', '').split(',') if v] or None
+    
+    tickets = database.iter_tickets(start, end, statuses, priorities, batch_size=EXPORT_CHUNK_ROWS)
+    filename = f"tickets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(export_rows(tickets, fmt)),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}", "X-Accel-Buffering": "no"},
+    )
+
+@api.route("/api/tickets/search", methods=["POST"])
+def search_tickets():
+    """Ranked full-text search over title, description and location"""
+    data = request.json
+    token = data.get('token')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success:
+        return jsonify({"success": False, "error": "Invalid session"}), 401
+    
+    text = (data.get('q') or '').strip()
+    if not text:
+        return jsonify({"success": False, "error": "Search text (q) required"}), 400
+    
+    try:
+        page = max(1, int(data.get('page', 1)))
+        per_page = max(1, min(int(data.get('per_page', 20)), 100))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "page and per_page must be integers"}), 400
+    
+    # Filters accept a single value or a list; users only ever see their own tickets
+    statuses = data.get('status')
+    priorities = data.get('priority')
+    tickets, total = database.search_tickets(
+        text,
+        statuses=[statuses] if isinstance(statuses, str) else statuses,
+        priorities=[priorities] if isinstance(priorities, str) else priorities,
+        user_id=None if user['role'] == 'admin' else user['user_id'],
+        offset=(page - 1) * per_page,
+        limit=per_page
+    )
+    return jsonify({"success": True, "tickets": tickets, "total": total, "page": page, "per_page": per_page})
 
-@app.route("/api/tickets/<int:ticket_id>", methods=["GET"])
+@api.route("/api/heatmap", methods=["GET"])
+def get_heatmap():
+    """Damage aggregates per geohash cell for one zoom level and bounding box (admin only)"""
+    token = request.args.get('token') or request.headers.get('Authorization')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success or user['role'] != 'admin':
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    
+    try:
+        # bbox=west,south,east,north (the order map libraries use)
+        west, south, east, north = (float(v) for v in request.args.get('bbox', '-180,-90,180,90').split(','))
+        if 'precision' in request.args:
+            precision = max(1, min(int(request.args['precision']), config.HEATMAP_MAX_PRECISION))
+        else:
+            precision = heatmap.precision_for_zoom(request.args.get('zoom', 10))
+    except ValueError:
+        return jsonify({"success": False, "error": "bbox must be west,south,east,north and zoom/precision integers"}), 400
+    
+    cells = database.get_heatmap_cells(precision, south, west, north, east)
+    return jsonify({
+        "success": True,
+        "precision": precision,
+        "cells": [heatmap.format_cell(cell) for cell in cells]
+    })
+
+@api.route("/api/tickets/<int:ticket_id>", methods=["GET"])
 def get_ticket(ticket_id):
     """Get single ticket"""
     ticket = database.get_ticket_by_id(ticket_id)
@@ -517,7 +1299,7 @@ def get_ticket(ticket_id):
     else:
         return jsonify({"success": False, "error": "Ticket not found"}), 404
 
-@app.route("/api/tickets/<int:ticket_id>/update", methods=["POST"])
+@api.route("/api/tickets/<int:ticket_id>/update", methods=["POST"])
 def update_ticket(ticket_id):
     """Update ticket status (admin only)"""
     data = request.json
@@ -536,10 +1318,12 @@ def update_ticket(ticket_id):
     if not status:
         return jsonify({"success": False, "error": "Status required"}), 400
     
-    database.update_ticket_status(ticket_id, status, admin_notes)
+    success, previous_status = database.update_ticket_status(ticket_id, status, admin_notes)
+    if success:
+        ticket_changed("ticket_updated", ticket_id, {"previous_status": previous_status, "status": status})
     return jsonify({"success": True})
 
-@app.route("/api/dashboard/stats", methods=["POST"])
+@api.route("/api/dashboard/stats", methods=["POST"])
 def get_stats():
     """Get dashboard statistics"""
     data = request.json
@@ -560,10 +1344,190 @@ def get_stats():
     return jsonify({"success": True, "stats": stats})
 
 # --------------------------
-# 7️⃣ Run App
+# 7️⃣ Live Dashboard Events
 # --------------------------
+broker = EventBroker(history=config.EVENT_HISTORY)
+
+# With several web workers each process only sees its own writes, so a
+# MongoDB change stream feeds every worker's broker instead
+USE_CHANGE_STREAMS = config.EVENTS_CHANGE_STREAMS and config.DATABASE_BACKEND != "sqlite"
+
+# Off when several workers would each publish only their own writes
+events_available = True
+
+# ChangeStreamHistoryLost: the resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+def _publish(event_type, ticket_id, position=None, fields=None):
+    ticket = database.get_ticket_by_id(ticket_id)
+    if not ticket:
+        return
+    stats_delta = None
+    if fields is not None:
+        # Count the change the stream reported, not whatever the ticket holds now
+        stats_delta = ticket_stats_delta(event_type, {
+            "status": fields.get("status"),
+            "previous_status": fields.get("previous_status", ticket.get("previous_status")),
+        })
+    broker.publish(event_type, ticket, user_id=ticket.get("user_id"),
+                   position=position, stats_delta=stats_delta)
+
+def ticket_changed(event_type, ticket_id, change=None):
+    """Update the heatmap and push a ticket create/update to subscribed dashboards
+
+    `change` holds the values the write itself reported (e.g. previous_status
+    and status); they override the re-read ticket when counting, since another
+    update may have landed in between.
+    """
+    ticket = database.get_ticket_by_id(ticket_id)
+    if not ticket:
+        return
+    counted = dict(ticket, **change) if change else ticket
+    heatmap.record(database, event_type, counted)
+    if not USE_CHANGE_STREAMS:
+        broker.publish(event_type, ticket, user_id=ticket.get("user_id"),
+                       stats_delta=ticket_stats_delta(event_type, counted))
+
+def tickets_changed(event_type, ticket_ids):
+    """ticket_changed() for many tickets: one read and one heatmap write"""
+    if not ticket_ids:
+        return
+    tickets = database.get_tickets_by_ids(ticket_ids)
+    heatmap.record_many(database, event_type, tickets)
+    if not USE_CHANGE_STREAMS:
+        for ticket in tickets:
+            broker.publish(event_type, ticket, user_id=ticket.get("user_id"))
+
+def event_cursor():
+    """Cursor for list responses; None tells the dashboard there is no live feed"""
+    return broker.cursor() if events_available else None
+
+def _watch_change_stream():
+    # Resume tokens are the event ids, so every worker hands out the same ids
+    resume_token = None
+    gap = False
+
+    def on_change(event_type, ticket_id, token, fields):
+        nonlocal resume_token
+        _publish(event_type, ticket_id, position=token["_data"], fields=fields)
+        resume_token = token
+
+    def on_idle(token):
+        nonlocal gap
+        broker.advance(token["_data"], gap=gap)
+        gap = False
+
+    while True:
+        try:
+            database.watch_ticket_changes(on_change, resume_after=resume_token, on_idle=on_idle)
+        except Exception as e:
+            print(f"⚠️ Ticket change stream interrupted: {e}")
+            if getattr(e, "code", None) == CHANGE_STREAM_HISTORY_LOST:
+                # Events were missed: start from now and make older cursors reset
+                resume_token, gap = None, True
+            time.sleep(5)
+
+def start_event_feed(workers=1):
+    """Start the change-stream watcher (per process, after any fork)"""
+    global events_available
+    if USE_CHANGE_STREAMS:
+        broker.use_shared_positions()
+        threading.Thread(target=_watch_change_stream, name="ticket-changes", daemon=True).start()
+        print("📡 Dashboard events fed from the MongoDB change stream")
+    elif workers > 1:
+        # A worker would miss the others' writes and reset every client whose
+        # cursor came from another worker, so dashboards fall back to re-fetching
+        events_available = False
+        print(f"⚠️ Live dashboard events are off with {workers} workers; "
+              f"set EVENTS_CHANGE_STREAMS=1 (MongoDB replica set) to enable them")
+
+@api.route("/api/events/stream", methods=["GET"])
+def event_stream():
+    """Server-sent ticket events: admins see every ticket, users their own"""
+    # EventSource can't set headers, so the token comes in the query string
+    token = request.args.get('token')
+    
+    if not token:
+        return jsonify({"success": False, "error": "Authentication required"}), 401
+    
+    success, user = database.verify_session(token)
+    if not success:
+        return jsonify({"success": False, "error": "Invalid session"}), 401
+    
+    if not events_available:
+        return jsonify({
+            "success": False,
+            "error": "Live events need EVENTS_CHANGE_STREAMS=1 when running several workers"
+        }), 503
+    
+    # Browsers resend the last id they saw when reconnecting
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    user_id = None if user['role'] == 'admin' else user['user_id']
+    
+    return Response(
+        stream_with_context(broker.stream(cursor, user_id, max_seconds=config.EVENT_STREAM_SECONDS)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --------------------------
+# 8️⃣ App Factory & Run App
+# --------------------------
+def start_background_startup(init_database=True, load_model=True):
+    """Initialise the database, then load + warm the model without blocking startup
+
+    The database init is quick and every ticket/auth route needs it, so it
+    runs before the server accepts requests; only the slow model load is
+    deferred to a thread.
+    """
+    if init_database:
+        database.init_db()
+    if load_model and not registry.has_active():
+        threading.Thread(target=load_models, name="load-model", daemon=True).start()
+
+class ApiRequest(Request):
+    """Bulk imports get their own, larger body limit (IMPORT_MAX_MB)"""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint == "api.import_tickets":
+            return config.IMPORT_MAX_MB * 1024 * 1024
+        return super().max_content_length
+
+def create_app(init_database=True, load_model=True, warmup=True, background=False):
+    """Build the Flask app.
+
+    Production servers call this once in the master process (see wsgi.py and
+    gunicorn.conf.py) so the database is initialised once and the model is
+    shared copy-on-write by every forked worker. With background=True the
+    model loads in a thread (after the database is initialised), so routes
+    that don't need the model are served immediately.
+    """
+    app = Flask(__name__)
+    app.request_class = ApiRequest
+    app.config["MAX_CONTENT_LENGTH"] = config.MAX_UPLOAD_MB * 1024 * 1024
+    CORS(app)  # Enable CORS for frontend communication
+    app.register_blueprint(api)
+    endpoint_memory.install(app)
+    
+    if background:
+        start_background_startup(init_database, load_model)
+        return app
+    
+    if init_database:
+        database.init_db()
+    if load_model and not registry.has_active():
+        load_models(warmup=warmup)
+    
+    return app
+
 if __name__ == "__main__":
+    # Development server only - use `gunicorn -c gunicorn.conf.py wsgi:app` in production
     print("🚀 Starting Road Damage Management System API...")
-    load_models()
-    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
-
+    # With the debug reloader the parent process only watches files, so only
+    # the serving child process initialises the database and loads the model
+    reloader_parent = config.DEBUG and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+    app = create_app(init_database=not reloader_parent, load_model=not reloader_parent, background=True)
+    if not reloader_parent:
+        start_event_feed()
+    app.run(host=config.API_HOST, port=config.API_PORT, debug=config.DEBUG, threaded=True)
@@ -1,4 +1,6 @@
 """Configuration settings for the Road Damage Detection API"""
+import multiprocessing
+import os
 from pathlib import Path
 
 # Base directories
@@ -12,13 +14,81 @@ YOLO_MODEL_PATH = MODELS_FOLDER / "best.pt"
 SWIN_MODEL_PATH = MODELS_FOLDER / "swin_model.pth"
 TINYVIT_MODEL_PATH = MODELS_FOLDER / "tinyvit_model.pth"
 
+# Database settings
+# "mongo" (default) uses MongoDB Atlas, "sqlite" uses a local file (dev / load testing)
+DATABASE_BACKEND = os.environ.get("DATABASE_BACKEND", "mongo")
+SQLITE_PATH = Path(os.environ.get("SQLITE_PATH", BASE_DIR / "road_damage.db"))
+
 # API settings
 API_HOST = "0.0.0.0"
 API_PORT = 5000
 DEBUG = True
 
+# Model variant served at startup: "fp32" (bestyolov.pt) or "int8" (promoted by quantize_model.py)
+MODEL_VARIANT = os.environ.get("MODEL_VARIANT", "fp32")
+INT8_MODEL_PATH = MODELS_FOLDER / "bestyolov_int8.onnx"
+
+# Model registry
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 2048))
+MODEL_IDLE_SECONDS = float(os.environ.get("MODEL_IDLE_SECONDS", 600))  # evict inactive versions after this
+
+# Adaptive inference resolution: step down from 640 when p95 latency exceeds the target
+ADAPTIVE_RESOLUTION = os.environ.get("ADAPTIVE_RESOLUTION", "1") == "1"
+INFERENCE_SIZES = [640, 480, 320]
+LATENCY_TARGET_MS = float(os.environ.get("LATENCY_TARGET_MS", 500))
+RESOLUTION_QUEUE_DEPTH_LIMIT = 4  # queued inferences above which a request runs one size smaller
+
+# Inference admission control (per process)
+MAX_CONCURRENT_INFERENCES = int(os.environ.get("MAX_CONCURRENT_INFERENCES", 2))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 16))
+INFERENCE_QUEUE_TIMEOUT = float(os.environ.get("INFERENCE_QUEUE_TIMEOUT", 10))  # seconds
+# torch intra-op threads: split the cores between the concurrent inferences
+TORCH_THREADS = int(os.environ.get(
+    "TORCH_THREADS", max(1, multiprocessing.cpu_count() // MAX_CONCURRENT_INFERENCES)))
+
+# Upload limits: bodies over MAX_UPLOAD_MB are rejected before being read,
+# images over MAX_IMAGE_PIXELS are rejected from their header before decoding
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 25))
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", 60_000_000))
+
+# Bulk jobs (ticket import, re-scoring): images per forward pass, tickets per
+# import request, and the body limit of an import (a multipart batch or a zip)
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 8))
+IMPORT_MAX_ITEMS = int(os.environ.get("IMPORT_MAX_ITEMS", 500))
+IMPORT_MAX_MB = int(os.environ.get("IMPORT_MAX_MB", 1024))
+
+# Re-scoring stored tickets after a model upgrade (rescore.py): progress file
+# and the most images per second it may score
+RESCORE_CHECKPOINT = Path(os.environ.get("RESCORE_CHECKPOINT", BASE_DIR / "rescore_checkpoint.json"))
+RESCORE_MAX_PER_SECOND = float(os.environ.get("RESCORE_MAX_PER_SECOND", 2))
+
+# Live dashboard events (server-sent events): events kept for resuming,
+# seconds before a stream is closed (the browser reconnects), and whether to
+# feed events from a MongoDB change stream (needed with several web workers)
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", 1000))
+EVENT_STREAM_SECONDS = int(os.environ.get("EVENT_STREAM_SECONDS", 300))
+EVENTS_CHANGE_STREAMS = os.environ.get("EVENTS_CHANGE_STREAMS", "0") == "1"
+
+# Heatmap aggregates are kept for geohash precisions 1..HEATMAP_MAX_PRECISION
+# (7 = cells of about 150 m x 150 m)
+HEATMAP_MAX_PRECISION = int(os.environ.get("HEATMAP_MAX_PRECISION", 7))
+
+# Near-duplicate ticket photos: a new photo within DEDUP_MAX_DISTANCE bits
+# (of a 64-bit perceptual hash) of a ticket from the last DEDUP_WINDOW_DAYS,
+# reported within DEDUP_RADIUS_M metres, reuses that ticket's analysis
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") == "1"
+DEDUP_MAX_DISTANCE = int(os.environ.get("DEDUP_MAX_DISTANCE", 8))
+DEDUP_RADIUS_M = float(os.environ.get("DEDUP_RADIUS_M", 50))
+DEDUP_WINDOW_DAYS = int(os.environ.get("DEDUP_WINDOW_DAYS", 30))
+DEDUP_SYNC_SECONDS = int(os.environ.get("DEDUP_SYNC_SECONDS", 30))
+
+# Per-endpoint memory accounting served in /metrics: off, rss (RSS retained
+# per request) or tracemalloc (adds the Python-heap peak; slower)
+MEMORY_STATS = os.environ.get("MEMORY_STATS", "rss")
+
 # Model settings
-YOLO_CONFIDENCE_THRESHOLD = 0.1
+# Served confidence threshold (pick it with sweep_settings.py)
+YOLO_CONFIDENCE_THRESHOLD = float(os.environ.get("CONF_THRESHOLD", 0.15))
 IMAGE_SIZE = 224
 
 # Class names
@@ -1,5 +1,6 @@
 """MongoDB database for Road Damage Management System"""
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
 from datetime import datetime
 import hashlib
 import secrets
@@ -20,6 +21,12 @@ def get_db():
         db = client[DATABASE_NAME]
     return db
 
+def reset_connection():
+    """Drop the cached client (MongoClient is not fork-safe; call in each forked worker)"""
+    global client, db
+    client = None
+    db = None
+
 def hash_password(password):
     """Hash password using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -34,6 +41,14 @@ def init_db():
         db.users.create_index("email", unique=True)
         db.sessions.create_index("token", unique=True)
         db.sessions.create_index("expires_at")
+        db.tickets.create_index("created_at")
+        db.tickets.create_index("duplicate_of", sparse=True)
+        db.heatmap_cells.create_index([("precision", 1), ("lat", 1), ("lon", 1)])
+        db.tickets.create_index(
+            [("title", "text"), ("description", "text"), ("location", "text")],
+            weights={"title": 5, "location": 3, "description": 1},
+            name="tickets_text"
+        )
         
         # Create default admin if not exists
         admin = db.users.find_one({"username": "admin"})
@@ -149,48 +164,79 @@ def verify_session(token):
         print(f"[ERROR] Session verification failed: {e}")
         return False, None
 
+def priority_for(damage_percentage):
+    """Ticket priority from the damaged share of the image"""
+    if damage_percentage > 30:
+        return 'high'
+    if damage_percentage > 15:
+        return 'medium'
+    return 'low'
+
+def _ticket_document(user_id, title, description, location, image_path=None,
+                     annotated_image_path=None, damage_data=None, latitude=None, longitude=None,
+                     image_phash=None, duplicate_of=None):
+    damage_percentage = damage_data.get('percentage_damage', 0) if damage_data else 0
+    total_damaged_area = damage_data.get('total_damaged_area', 0) if damage_data else 0
+    total_detections = damage_data.get('total_detections', 0) if damage_data else 0
+    
+    return {
+        "user_id": user_id,
+        "title": title,
+        "description": description,
+        "location": location,
+        "latitude": latitude,
+        "longitude": longitude,
+        "image_path": image_path,
+        "annotated_image_path": annotated_image_path,
+        "status": "pending",
+        "priority": priority_for(damage_percentage),
+        "damage_percentage": damage_percentage,
+        "total_damaged_area": total_damaged_area,
+        "total_detections": total_detections,
+        "admin_notes": None,
+        "image_phash": image_phash,
+        "duplicate_of": duplicate_of,
+        "model_version": damage_data.get('model') if damage_data else None,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    }
+
 def create_ticket(user_id, title, description, location, image_path=None, 
-                 annotated_image_path=None, damage_data=None, latitude=None, longitude=None):
-    """Create a new ticket"""
+                 annotated_image_path=None, damage_data=None, latitude=None, longitude=None,
+                 image_phash=None, duplicate_of=None):
+    """Create a new ticket (duplicate_of links it to an earlier ticket of the same damage)"""
     try:
         db = get_db()
-        
-        damage_percentage = damage_data.get('percentage_damage', 0) if damage_data else 0
-        total_damaged_area = damage_data.get('total_damaged_area', 0) if damage_data else 0
-        total_detections = damage_data.get('total_detections', 0) if damage_data else 0
-        
-        # Set priority based on damage percentage
-        if damage_percentage > 30:
-            priority = 'high'
-        elif damage_percentage > 15:
-            priority = 'medium'
-        else:
-            priority = 'low'
-        
-        result = db.tickets.insert_one({
-            "user_id": user_id,
-            "title": title,
-            "description": description,
-            "location": location,
-            "latitude": latitude,
-            "longitude": longitude,
-            "image_path": image_path,
-            "annotated_image_path": annotated_image_path,
-            "status": "pending",
-            "priority": priority,
-            "damage_percentage": damage_percentage,
-            "total_damaged_area": total_damaged_area,
-            "total_detections": total_detections,
-            "admin_notes": None,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        })
-        
+        result = db.tickets.insert_one(_ticket_document(
+            user_id, title, description, location, image_path, annotated_image_path,
+            damage_data, latitude, longitude, image_phash, duplicate_of
+        ))
         return str(result.inserted_id)
     except Exception as e:
         print(f"[ERROR] Ticket creation failed: {e}")
         return None
 
+def create_tickets(tickets):
+    """Create many tickets with one unordered insert_many
+
+    Each item is a dict of create_ticket's arguments. Returns one id per item,
+    or None for items that failed; a failed item doesn't stop the others.
+    """
+    documents = [_ticket_document(**ticket) for ticket in tickets]
+    if not documents:
+        return []
+    try:
+        db = get_db()
+        result = db.tickets.insert_many(documents, ordered=False)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        print(f"[ERROR] {len(failed)} of {len(documents)} ticket inserts failed")
+        return [None if i in failed else str(doc["_id"]) for i, doc in enumerate(documents)]
+    except Exception as e:
+        print(f"[ERROR] Bulk ticket creation failed: {e}")
+        return [None] * len(documents)
+
 def get_user_tickets(user_id):
     """Get all tickets for a user"""
     try:
@@ -236,8 +282,163 @@ def get_all_tickets():
         print(f"[ERROR] Failed to get all tickets: {e}")
         return []
 
+def get_hashed_tickets(since):
+    """Analysed original (non-duplicate) tickets with an image hash created since a datetime"""
+    try:
+        db = get_db()
+        tickets = list(db.tickets.find(
+            {"created_at": {"$gte": since}, "image_phash": {"$ne": None},
+             "annotated_image_path": {"$ne": None}, "duplicate_of": None},
+            {"image_phash": 1, "latitude": 1, "longitude": 1, "location": 1, "created_at": 1,
+             "annotated_image_path": 1, "damage_percentage": 1, "total_damaged_area": 1,
+             "total_detections": 1}
+        ))
+        for ticket in tickets:
+            ticket["id"] = str(ticket.pop("_id"))
+        return tickets
+    except Exception as e:
+        print(f"[ERROR] Failed to get ticket hashes: {e}")
+        return []
+
+def search_tickets(text, statuses=None, priorities=None, user_id=None, offset=0, limit=20):
+    """Full-text search over title, description and location, best matches first
+
+    Returns (tickets for this page, total number of matches).
+    """
+    try:
+        db = get_db()
+        query = {"$text": {"$search": text}}
+        if statuses:
+            query["status"] = {"$in": statuses}
+        if priorities:
+            query["priority"] = {"$in": priorities}
+        if user_id:
+            query["user_id"] = user_id
+        
+        score = {"score": {"$meta": "textScore"}}
+        page = list(db.tickets.find(query, score).sort([("score", {"$meta": "textScore"})]).skip(offset).limit(limit))
+        total = db.tickets.count_documents(query)
+        return list(_enrich_batch(db, page)), total
+    except Exception as e:
+        print(f"[ERROR] Ticket search failed: {e}")
+        return [], 0
+
+def iter_tickets(start=None, end=None, statuses=None, priorities=None, batch_size=500):
+    """Stream tickets oldest-first for export, one server-side batch at a time
+
+    start is inclusive and end exclusive (datetimes). statuses and priorities
+    are lists to match, or None for any. Only one batch of tickets and their
+    users is held in memory at a time.
+    """
+    db = get_db()
+
+    query = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if statuses:
+        query["status"] = {"$in": statuses}
+    if priorities:
+        query["priority"] = {"$in": priorities}
+
+    cursor = db.tickets.find(query).sort("created_at", 1).batch_size(batch_size)
+    batch = []
+    for ticket in cursor:
+        batch.append(ticket)
+        if len(batch) >= batch_size:
+            yield from _enrich_batch(db, batch)
+            batch = []
+    if batch:
+        yield from _enrich_batch(db, batch)
+
+def _enrich_batch(db, tickets):
+    """Attach user fields to a batch of tickets with a single users query"""
+    from bson import ObjectId
+    
+    user_ids = {ObjectId(t["user_id"]) for t in tickets if ObjectId.is_valid(t.get("user_id"))}
+    users = {str(u["_id"]): u for u in db.users.find({"_id": {"$in": list(user_ids)}})}
+    for ticket in tickets:
+        user = users.get(str(ticket.get("user_id")))
+        if user:
+            ticket["username"] = user["username"]
+            ticket["email"] = user["email"]
+            ticket["full_name"] = user["full_name"]
+            ticket["phone"] = user.get("phone")
+        
+        ticket["id"] = str(ticket["_id"])
+        ticket["_id"] = str(ticket["_id"])
+        ticket["created_at"] = ticket["created_at"].isoformat() if isinstance(ticket["created_at"], datetime) else str(ticket["created_at"])
+        ticket["updated_at"] = ticket["updated_at"].isoformat() if isinstance(ticket["updated_at"], datetime) else str(ticket["updated_at"])
+        yield ticket
+
+def get_tickets_to_rescore(model_version, after_id=None, limit=100):
+    """Next tickets (by _id) with a stored image that model_version hasn't scored yet"""
+    from bson import ObjectId
+    db = get_db()
+    query = {"image_path": {"$ne": None}, "model_version": {"$ne": model_version}}
+    if after_id:
+        query["_id"] = {"$gt": ObjectId(after_id)}
+    tickets = list(db.tickets.find(
+        query,
+        {"image_path": 1, "annotated_image_path": 1, "latitude": 1, "longitude": 1,
+         "priority": 1, "damage_percentage": 1, "model_version": 1}
+    ).sort("_id", 1).limit(limit))
+    for ticket in tickets:
+        ticket["id"] = str(ticket["_id"])
+        ticket["_id"] = str(ticket["_id"])
+    return tickets
+
+def update_ticket_scores(updates):
+    """Store re-scored damage fields for many tickets with one unordered bulk write
+
+    Each update is {"id", "damage_data", "annotated_image_path", "model_version"}.
+    Returns the ids of the tickets updated.
+    """
+    from bson import ObjectId
+    from pymongo import UpdateOne
+    operations = []
+    for update in updates:
+        damage_data = update["damage_data"]
+        operations.append(UpdateOne({"_id": ObjectId(update["id"])}, {"$set": {
+            "damage_percentage": damage_data.get('percentage_damage', 0),
+            "total_damaged_area": damage_data.get('total_damaged_area', 0),
+            "total_detections": damage_data.get('total_detections', 0),
+            "priority": priority_for(damage_data.get('percentage_damage', 0)),
+            "annotated_image_path": update["annotated_image_path"],
+            "model_version": update["model_version"],
+        }}))
+    if not operations:
+        return []
+    try:
+        db = get_db()
+        db.tickets.bulk_write(operations, ordered=False)
+        return [update["id"] for update in updates]
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        print(f"[ERROR] {len(failed)} ticket re-score updates failed")
+        return [update["id"] for i, update in enumerate(updates) if i not in failed]
+    except Exception as e:
+        print(f"[ERROR] Ticket re-score update failed: {e}")
+        return []
+
+def get_referenced_outputs(paths):
+    """Which of these annotated image paths some ticket still points to"""
+    try:
+        db = get_db()
+        return set(db.tickets.distinct("annotated_image_path", {"annotated_image_path": {"$in": list(paths)}}))
+    except Exception as e:
+        print(f"[ERROR] Failed to check annotated images: {e}")
+        return set(paths)  # keep everything when unsure
+
 def update_ticket_status(ticket_id, status, admin_notes=None):
-    """Update ticket status"""
+    """Update ticket status (the old status is kept in previous_status)
+
+    Returns (success, previous status) with the previous status read by the
+    same atomic write, so concurrent updates each see the transition they made.
+    """
     try:
         db = get_db()
         from bson import ObjectId
@@ -250,15 +451,22 @@ def update_ticket_status(ticket_id, status, admin_notes=None):
         if admin_notes is not None:
             update_data["admin_notes"] = admin_notes
         
-        db.tickets.update_one(
+        # Pipeline update: copies the old status atomically, so change-stream
+        # consumers can work out the stats delta from the update alone
+        before = db.tickets.find_one_and_update(
             {"_id": ObjectId(ticket_id)},
-            {"$set": update_data}
+            [{"$set": {"previous_status": "$status",
+                       **{key: {"$literal": value} for key, value in update_data.items()}}}],
+            projection={"status": 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        return True
+        if not before:
+            return False, None
+        return True, before.get("status")
     except Exception as e:
         print(f"[ERROR] Failed to update ticket: {e}")
-        return False
+        return False, None
 
 def get_ticket_by_id(ticket_id):
     """Get single ticket by ID"""
@@ -287,6 +495,20 @@ def get_ticket_by_id(ticket_id):
         print(f"[ERROR] Failed to get ticket: {e}")
         return None
 
+def get_tickets_by_ids(ticket_ids):
+    """Tickets with the given IDs (in no particular order), two queries for any number"""
+    try:
+        db = get_db()
+        from bson import ObjectId
+        
+        ids = [ObjectId(ticket_id) for ticket_id in ticket_ids if ObjectId.is_valid(ticket_id)]
+        if not ids:
+            return []
+        return list(_enrich_batch(db, list(db.tickets.find({"_id": {"$in": ids}}))))
+    except Exception as e:
+        print(f"[ERROR] Failed to get tickets: {e}")
+        return []
+
 def get_dashboard_stats(user_id=None):
     """Get dashboard statistics"""
     try:
@@ -331,6 +553,85 @@ def get_dashboard_stats(user_id=None):
             'total_users': 0 if not user_id else None
         }
 
+def watch_ticket_changes(on_change, resume_after=None, on_idle=None):
+    """Block on a change stream of ticket inserts/updates (needs a replica set, e.g. Atlas)
+
+    Calls on_change(event_type, ticket_id, resume_token, fields) for every
+    change. event_type is "ticket_created", "ticket_updated" (status changed),
+    "ticket_rescored" (damage scores changed) or "ticket_edited" (anything
+    else, e.g. admin notes), and fields holds the values the change wrote.
+    on_idle(resume_token) is called when the stream opens and whenever a wait
+    returns no change, so the caller knows how far the stream has read even
+    when nothing happens.
+    """
+    db = get_db()
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    with db.tickets.watch(pipeline, resume_after=resume_after) as stream:
+        if on_idle and stream.resume_token:
+            on_idle(stream.resume_token)
+        while stream.alive:
+            change = stream.try_next()
+            if change is None:
+                if on_idle and stream.resume_token:
+                    on_idle(stream.resume_token)
+                continue
+            if change["operationType"] == "insert":
+                event_type, fields = "ticket_created", change["fullDocument"]
+            else:
+                fields = change.get("updateDescription", {}).get("updatedFields", {})
+                if "status" in fields:
+                    event_type = "ticket_updated"
+                elif "damage_percentage" in fields:
+                    event_type = "ticket_rescored"
+                else:
+                    event_type = "ticket_edited"
+            on_change(event_type, str(change["documentKey"]["_id"]), change["_id"], fields)
+
+def apply_heatmap_delta(cells, delta):
+    """Add delta (counter -> change) to each (precision, cell, lat, lon) heatmap cell"""
+    return apply_heatmap_deltas([(cell, delta) for cell in cells])
+
+def apply_heatmap_deltas(cell_deltas):
+    """Apply [((precision, cell, lat, lon), delta)] in one bulk write"""
+    try:
+        db = get_db()
+        from pymongo import UpdateOne
+        
+        db.heatmap_cells.bulk_write([
+            UpdateOne(
+                {"_id": f"{precision}:{cell}"},
+                {"$inc": delta, "$setOnInsert": {"precision": precision, "cell": cell, "lat": lat, "lon": lon}},
+                upsert=True
+            )
+            for (precision, cell, lat, lon), delta in cell_deltas
+        ], ordered=False)
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to update heatmap: {e}")
+        return False
+
+def get_heatmap_cells(precision, south, west, north, east, limit=5000):
+    """Non-empty heatmap cells of one precision whose centre is inside the box"""
+    try:
+        db = get_db()
+        return list(db.heatmap_cells.find({
+            "precision": precision,
+            "lat": {"$gte": south, "$lte": north},
+            "lon": {"$gte": west, "$lte": east},
+            "count": {"$gt": 0}
+        }, {"_id": 0}).limit(limit))
+    except Exception as e:
+        print(f"[ERROR] Failed to get heatmap: {e}")
+        return []
+
+def replace_heatmap(cells):
+    """Replace every heatmap cell (used by heatmap.py --rebuild)"""
+    db = get_db()
+    db.heatmap_cells.delete_many({})
+    for i in range(0, len(cells), 1000):
+        db.heatmap_cells.insert_many(
+            [{"_id": f"{c['precision']}:{c['cell']}", **c} for c in cells[i:i + 1000]], ordered=False)
+
 # Initialize database on import
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,177 @@
+"""Live ticket events for dashboards (server-sent events)
+
+Ticket creates, status updates and re-scores are published as small deltas:
+the changed ticket plus the change to each stat counter (only creates and
+status changes move a counter). Dashboards subscribe once with
+EventSource instead of re-fetching every ticket after each change.
+
+Events are kept in a bounded in-memory history per process, so a reconnecting
+client resumes exactly where it left off (EventSource sends Last-Event-ID
+automatically). Event ids have one of two forms:
+
+  - "<boot id>:<sequence>" when the process publishes its own writes. Only
+    that process can resume them, which is why several web workers need the
+    change-stream feed.
+  - "cs:<resume token>" when every worker is fed from the same MongoDB change
+    stream. Resume tokens are identical in every worker and sort in stream
+    order, so any worker that was already watching at that point can resume.
+
+If the cursor can't be honoured (another boot, or older than the history) the
+client gets a "reset" event and re-fetches once.
+"""
+import json
+import secrets
+import threading
+import time
+from collections import deque
+
+# Statuses that have a counter in get_dashboard_stats()
+COUNTED_STATUSES = ("pending", "in_progress", "resolved")
+
+# Feed id of change-stream event ids
+SHARED_FEED = "cs"
+
+
+def ticket_stats_delta(event_type, ticket):
+    """How the dashboard counters change for one ticket event"""
+    delta = {}
+    status = ticket.get("status")
+    if event_type == "ticket_created":
+        delta["total_tickets"] = 1
+        if status in COUNTED_STATUSES:
+            delta[status] = 1
+    elif event_type == "ticket_updated":
+        previous = ticket.get("previous_status")
+        if previous != status:
+            if previous in COUNTED_STATUSES:
+                delta[previous] = delta.get(previous, 0) - 1
+            if status in COUNTED_STATUSES:
+                delta[status] = delta.get(status, 0) + 1
+    return delta
+
+
+class EventBroker:
+    """Bounded, resumable fan-out of ticket events to SSE subscribers"""
+
+    def __init__(self, history=1000):
+        self.boot_id = secrets.token_hex(4)
+        self.feed_id = self.boot_id
+        self._events = deque(maxlen=history)  # (position, user_id, payload)
+        self._position = 0  # newest event, or how far the change stream has read
+        self._floor = 0     # cursors older than this can't be replayed
+        self._cond = threading.Condition()
+
+    def use_shared_positions(self):
+        """Switch to change-stream resume tokens as positions (before serving)
+
+        Nothing can be replayed until advance() reports where the stream starts.
+        """
+        with self._cond:
+            self.feed_id = SHARED_FEED
+            self._events.clear()
+            self._position = ""
+            self._floor = None
+
+    def advance(self, position, gap=False):
+        """Record how far the change stream has read without an event
+
+        gap=True means events before `position` were missed, so older cursors
+        must reset.
+        """
+        with self._cond:
+            if self._floor is None or gap:
+                self._floor = position
+            if position > self._position:
+                self._position = position
+
+    def cursor(self):
+        """Id of the newest event; pass it to stream() to get everything after it"""
+        with self._cond:
+            return f"{self.feed_id}:{self._position}"
+
+    def publish(self, event_type, ticket, user_id=None, position=None, stats_delta=None):
+        """Record an event and wake every subscriber; returns its id
+
+        `position` is the change-stream resume token in shared mode, else the
+        next sequence number is used. stats_delta defaults to the one derived
+        from the ticket (see ticket_stats_delta).
+        """
+        if stats_delta is None:
+            stats_delta = ticket_stats_delta(event_type, ticket)
+        with self._cond:
+            if position is None:
+                position = self._position + 1
+            event_id = f"{self.feed_id}:{position}"
+            payload = json.dumps({
+                "id": event_id,
+                "type": event_type,
+                "ticket": ticket,
+                "stats_delta": stats_delta,
+            }, default=str)
+            if len(self._events) == self._events.maxlen:
+                self._floor = self._events[0][0]
+            self._events.append((position, str(user_id) if user_id is not None else None, payload))
+            if self._floor is None:
+                self._floor = position
+            self._position = max(self._position, position)
+            self._cond.notify_all()
+            return event_id
+
+    def parse_cursor(self, cursor):
+        """Position to resume after, or None if the cursor can't be honoured"""
+        if not cursor:
+            with self._cond:
+                return self._position  # new subscriber: only future events
+        feed_id, _, position = cursor.partition(":")
+        if feed_id != self.feed_id:
+            return None
+        with self._cond:
+            if feed_id != SHARED_FEED:
+                if not position.isdigit():
+                    return None
+                position = int(position)
+                if position > self._position:
+                    return None
+            # In shared mode a cursor ahead of this worker is fine: another
+            # worker read the stream a little further, the events will follow
+            if self._floor is None or position < self._floor:
+                return None
+        return position
+
+    def wait_for_events(self, after, user_id=None, timeout=15.0):
+        """Events newer than `after` visible to user_id (None = admin, sees all)
+
+        Blocks up to `timeout` seconds when there are none yet.
+        Returns (events, new cursor position).
+        """
+        with self._cond:
+            if self._position <= after:
+                self._cond.wait(timeout)
+            events = [
+                (position, payload)
+                for position, owner, payload in self._events
+                if position > after and (user_id is None or owner == str(user_id))
+            ]
+            return events, max(after, self._position)
+
+    def stream(self, cursor, user_id=None, max_seconds=300, heartbeat=15.0):
+        """Generator of SSE-formatted text for one subscriber
+
+        The connection is closed after max_seconds so long-lived streams don't
+        hold a server thread forever; EventSource reconnects and resumes.
+        """
+        after = self.parse_cursor(cursor)
+        if after is None:
+            with self._cond:
+                after = self._position
+            yield f"id: {self.feed_id}:{after}\ndata: {json.dumps({'type': 'reset'})}\n\n"
+        yield "retry: 3000\n\n"
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events, latest = self.wait_for_events(after, user_id, timeout=heartbeat)
+            if not events:
+                yield ": keep-alive\n\n"
+            for position, payload in events:
+                yield f"id: {self.feed_id}:{position}\ndata: {payload}\n\n"
+            after = latest
@@ -0,0 +1,113 @@
+"""Compact detection payloads for live camera frames
+
+The camera client already has the frame it sent, so instead of plotting the
+overlay and re-encoding the frame as a JPEG, /predict_frame can return only
+the detections and let the client draw them. Mask polygons are simplified
+with Douglas-Peucker and every coordinate is quantized to integer pixels of
+the frame the client sent.
+
+JSON (output=json):
+    {"width": 640, "height": 480, "percentage_damage": 3.41,
+     "detections": [{"class": 1, "confidence": 0.87,
+                     "box": [x1, y1, x2, y2], "polygon": [x0, y0, x1, y1, ...]}]}
+
+Binary (output=binary), little-endian:
+    header     "RDF1", u16 width, u16 height, f32 percentage_damage, u16 count
+    detection  u8 class, u8 confidence (x255), 4 x u16 box,
+               u16 point count, point count x (u16 x, u16 y)
+
+Frames wider or taller than MAX_BINARY_SIZE don't fit the u16 fields; use
+output=json for those.
+"""
+import struct
+
+import numpy as np
+
+MAGIC = b"RDF1"
+_HEADER = struct.Struct("<4sHHfH")
+_DETECTION = struct.Struct("<BB4HH")
+MAX_BINARY_SIZE = 65535
+
+
+def _to_numpy(values):
+    """Plain array from a torch tensor, a stub array or a numpy array"""
+    if hasattr(values, "cpu"):
+        values = values.cpu()
+    if hasattr(values, "numpy"):
+        values = values.numpy()
+    return np.asarray(values)
+
+
+def extract_detections(result, scale_x=1.0, scale_y=1.0, width=None, height=None, epsilon=1.5):
+    """Boxes, classes, confidences and simplified polygons from one result
+
+    scale_x / scale_y map decoded-image pixels back to the client's frame, and
+    epsilon is the polygon simplification tolerance in those pixels.
+    """
+    import cv2
+
+    if result.boxes is None or len(result.boxes) == 0:
+        return []
+
+    boxes = _to_numpy(result.boxes.xyxy).reshape(-1, 4) * (scale_x, scale_y, scale_x, scale_y)
+    classes = _to_numpy(result.boxes.cls).astype(int)
+    confidences = _to_numpy(result.boxes.conf)
+    polygons = result.masks.xy if result.masks is not None else []
+    max_x = (width or 65535) - 1
+    max_y = (height or 65535) - 1
+
+    detections = []
+    for i, box in enumerate(boxes):
+        polygon = []
+        if i < len(polygons) and len(polygons[i]) >= 3:
+            points = (polygons[i] * (scale_x, scale_y)).astype(np.float32)
+            points = cv2.approxPolyDP(points.reshape(-1, 1, 2), epsilon, True).reshape(-1, 2)
+            points = np.rint(points).clip((0, 0), (max_x, max_y)).astype(int)
+            polygon = points.flatten().tolist()
+        detections.append({
+            "class": int(classes[i]),
+            "confidence": round(float(confidences[i]), 3),
+            "box": np.rint(box).clip(0, (max_x, max_y, max_x, max_y)).astype(int).tolist(),
+            "polygon": polygon,
+        })
+    return detections
+
+
+def encode_json(detections, width, height, percentage_damage):
+    return {
+        "width": width,
+        "height": height,
+        "percentage_damage": percentage_damage,
+        "detections": detections,
+    }
+
+
+def encode_binary(detections, width, height, percentage_damage):
+    if max(width, height) > MAX_BINARY_SIZE:
+        raise ValueError(f"Binary output is limited to {MAX_BINARY_SIZE} px frames, got {width}x{height}")
+    parts = [_HEADER.pack(MAGIC, width, height, percentage_damage, len(detections))]
+    for det in detections:
+        points = det["polygon"]
+        parts.append(_DETECTION.pack(
+            det["class"], round(det["confidence"] * 255), *det["box"], len(points) // 2))
+        parts.append(np.asarray(points, dtype="<u2").tobytes())
+    return b"".join(parts)
+
+
+def decode_binary(payload):
+    """Inverse of encode_binary (for tests and Python clients)"""
+    _, width, height, percentage_damage, count = _HEADER.unpack_from(payload, 0)
+    offset = _HEADER.size
+    detections = []
+    for _ in range(count):
+        cls, conf, x1, y1, x2, y2, n = _DETECTION.unpack_from(payload, offset)
+        offset += _DETECTION.size
+        points = np.frombuffer(payload, dtype="<u2", count=n * 2, offset=offset)
+        offset += n * 4
+        detections.append({
+            "class": cls,
+            "confidence": round(conf / 255, 3),
+            "box": [x1, y1, x2, y2],
+            "polygon": points.astype(int).tolist(),
+        })
+    return encode_json(detections, width, height, round(percentage_damage, 2))
@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration for production serving
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment overrides:
+    BIND            address to listen on (default 0.0.0.0:5000)
+    WEB_WORKERS     worker processes (default: half the CPU cores, at least 2)
+    WEB_THREADS     request threads per worker (default 16; every open
+                    dashboard event stream holds one)
+    TORCH_THREADS   torch intra-op threads per inference
+                    (default: cores / (workers x MAX_CONCURRENT_INFERENCES))
+"""
+import gc
+import multiprocessing
+import os
+
+import config as app_config
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_WORKERS", max(2, cpu_count // 2)))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 16))
+timeout = 120
+graceful_timeout = 30
+
+# Import wsgi.py (init_db + model load) once in the master, before forking
+preload_app = True
+
+# Split the cores between every inference that can run at once (workers x
+# per-worker admission slots) so they don't oversubscribe the CPU
+torch_threads = int(os.environ.get(
+    "TORCH_THREADS", max(1, cpu_count // (workers * app_config.MAX_CONCURRENT_INFERENCES))))
+
+
+def when_ready(server):
+    # Move everything loaded so far (model weights included) into the permanent
+    # GC generation, so collections in workers don't touch and copy those pages
+    gc.freeze()
+    server.log.info(f"Master ready: {workers} workers x {threads} threads, "
+                    f"{app_config.MAX_CONCURRENT_INFERENCES} inferences x {torch_threads} torch threads each")
+
+
+def post_fork(server, worker):
+    import app as api
+
+    # Connections opened by the master must not be shared across processes
+    api.database.reset_connection()
+    api.set_inference_threads(torch_threads)
+    api.warmup_model()
+    api.start_event_feed(workers=server.cfg.workers)
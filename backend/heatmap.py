@@ -0,0 +1,185 @@
+"""
+Damage Heatmap Aggregates
+Ticket counts, mean damage_percentage, priority mix and status mix per
+geohash cell, kept for every precision from 1 (~5000 km) to
+HEATMAP_MAX_PRECISION (7 = ~150 m). Each ticket create / status update / re-score applies
+a small delta to one cell per precision, so a map view only reads the cells
+inside its bounding box, however many tickets there are.
+
+Rebuild everything from the tickets (e.g. after a restore or a missed write):
+    python heatmap.py --rebuild
+"""
+
+import argparse
+import sys
+
+import config
+
+PRIORITIES = ("high", "medium", "low")
+STATUSES = ("pending", "in_progress", "resolved")
+COUNTERS = ("count", "damage_sum") + PRIORITIES + STATUSES
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Web-map zoom level -> geohash precision giving a few dozen cells per screen
+_ZOOM_PRECISION = [1, 1, 1, 2, 2, 2, 3, 3, 4, 4, 4, 5, 5, 6, 6, 6, 7, 7, 8, 8, 8]
+
+
+def geohash(latitude, longitude, precision):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_center(cell):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def precision_for_zoom(zoom):
+    zoom = max(0, min(int(zoom), len(_ZOOM_PRECISION) - 1))
+    return min(_ZOOM_PRECISION[zoom], config.HEATMAP_MAX_PRECISION)
+
+
+def ticket_cells(latitude, longitude):
+    """[(precision, cell, center_lat, center_lon)] for one location"""
+    full = geohash(latitude, longitude, config.HEATMAP_MAX_PRECISION)
+    return [(p, full[:p], *cell_center(full[:p])) for p in range(1, config.HEATMAP_MAX_PRECISION + 1)]
+
+
+def ticket_delta(event_type, ticket):
+    """Counter changes for one ticket event, or None if the heatmap is unaffected"""
+    status = ticket.get("status")
+    if event_type == "ticket_created":
+        delta = {"count": 1, "damage_sum": float(ticket.get("damage_percentage") or 0)}
+        if ticket.get("priority") in PRIORITIES:
+            delta[ticket["priority"]] = 1
+        if status in STATUSES:
+            delta[status] = 1
+        return delta
+    if event_type == "ticket_rescored":
+        # A new model changed the damage figures (previous_* hold the old ones)
+        delta = {"damage_sum": float(ticket.get("damage_percentage") or 0)
+                 - float(ticket.get("previous_damage_percentage") or 0)}
+        if ticket.get("previous_priority") != ticket.get("priority"):
+            if ticket.get("previous_priority") in PRIORITIES:
+                delta[ticket["previous_priority"]] = -1
+            if ticket.get("priority") in PRIORITIES:
+                delta[ticket["priority"]] = 1
+        return delta
+    previous = ticket.get("previous_status")
+    if event_type == "ticket_updated" and previous != status:
+        delta = {}
+        if previous in STATUSES:
+            delta[previous] = -1
+        if status in STATUSES:
+            delta[status] = 1
+        return delta or None
+    return None
+
+
+def record(database, event_type, ticket):
+    """Apply one ticket create/update to the stored aggregates"""
+    if ticket.get("latitude") is None or ticket.get("longitude") is None:
+        return
+    delta = ticket_delta(event_type, ticket)
+    if delta:
+        database.apply_heatmap_delta(ticket_cells(float(ticket["latitude"]), float(ticket["longitude"])), delta)
+
+
+def record_many(database, event_type, tickets):
+    """Apply the events of many tickets with one write (deltas summed per cell)"""
+    cell_deltas = {}
+    for ticket in tickets:
+        if ticket.get("latitude") is None or ticket.get("longitude") is None:
+            continue
+        delta = ticket_delta(event_type, ticket)
+        if not delta:
+            continue
+        for cell in ticket_cells(float(ticket["latitude"]), float(ticket["longitude"])):
+            summed = cell_deltas.setdefault(cell, {})
+            for name, change in delta.items():
+                summed[name] = summed.get(name, 0) + change
+    if cell_deltas:
+        database.apply_heatmap_deltas(list(cell_deltas.items()))
+
+
+def format_cell(row):
+    count = row.get("count") or 0
+    return {
+        "cell": row["cell"],
+        "lat": row["lat"],
+        "lon": row["lon"],
+        "count": count,
+        "mean_damage": round((row.get("damage_sum") or 0) / count, 2) if count else 0.0,
+        "priority": {p: row.get(p) or 0 for p in PRIORITIES},
+        "status": {s: row.get(s) or 0 for s in STATUSES},
+    }
+
+
+def rebuild(database):
+    """Recompute every cell from the tickets (streams tickets; holds only the cells)"""
+    cells = {}
+    tickets = 0
+    for ticket in database.iter_tickets():
+        if ticket.get("latitude") is None or ticket.get("longitude") is None:
+            continue
+        delta = ticket_delta("ticket_created", ticket)
+        for precision, cell, lat, lon in ticket_cells(float(ticket["latitude"]), float(ticket["longitude"])):
+            row = cells.setdefault((precision, cell), {"precision": precision, "cell": cell, "lat": lat, "lon": lon,
+                                                       **{name: 0 for name in COUNTERS}})
+            for name, change in delta.items():
+                row[name] += change
+        tickets += 1
+    database.replace_heatmap(list(cells.values()))
+    return tickets, len(cells)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the damage heatmap aggregates")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all cells from the tickets")
+    args = parser.parse_args()
+
+    if config.DATABASE_BACKEND == "sqlite":
+        import sqlite_database as database
+    else:
+        import database
+
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+
+    print("[INFO] Rebuilding heatmap aggregates...")
+    database.init_db()
+    tickets, cells = rebuild(database)
+    print(f"[SUCCESS] Heatmap rebuilt from {tickets} located tickets into {cells} cells")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Image decoding sized for inference
+
+Phone and survey photos are often 12+ megapixels, but the model never sees
+more than 640 px. The image header is read first (no pixel data), and when
+the source is much larger than the inference size the image is decoded
+directly at 1/2, 1/4 or 1/8 scale with OpenCV's reduced decode modes. For
+JPEG this happens inside libjpeg's DCT, so the full-size bitmap is never
+allocated.
+
+cv2 and PIL are imported lazily, like the heavy imports in app.py.
+"""
+import io
+from pathlib import Path
+
+# EXIF orientations that rotate the image by 90 / 270 degrees
+_TRANSPOSING_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class ImageTooLarge(ValueError):
+    """Image has more pixels than the configured limit"""
+
+
+class DecodedImage:
+    """Decoded BGR pixels plus the mapping back to original-image pixels"""
+
+    def __init__(self, pixels, original_width, original_height, reduction):
+        self.pixels = pixels
+        self.original_width = original_width
+        self.original_height = original_height
+        self.reduction = reduction
+        self.scale_x = original_width / pixels.shape[1]
+        self.scale_y = original_height / pixels.shape[0]
+
+    @property
+    def area_scale(self):
+        """Multiply decoded-pixel areas by this to get original-pixel areas"""
+        return self.scale_x * self.scale_y
+
+
+def read_image_size(source):
+    """(width, height) from the image header, after EXIF rotation; None if unreadable"""
+    from PIL import Image
+
+    try:
+        fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+        with Image.open(fp) as img:
+            width, height = img.size
+            try:
+                orientation = img.getexif().get(0x0112)
+            except Exception:
+                orientation = None
+    except Exception:
+        return None
+    if orientation in _TRANSPOSING_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+def choose_reduction(width, height, target_size):
+    """Largest of 8 / 4 / 2 / 1 that still leaves the long side >= target_size"""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side / factor >= target_size:
+            return factor
+    return 1
+
+
+def decode_image(source, target_size=640, max_pixels=None):
+    """Decode bytes or a file path at the smallest scale that still covers target_size
+
+    Raises ImageTooLarge (before decoding) if the header reports more than
+    max_pixels, and ValueError if the data isn't a decodable image.
+    """
+    import cv2
+    import numpy as np
+
+    flags = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+
+    size = read_image_size(str(source) if isinstance(source, Path) else source)
+    reduction = 1
+    if size is not None:
+        width, height = size
+        if max_pixels and width * height > max_pixels:
+            raise ImageTooLarge(f"Image is {width}x{height}, more than the {max_pixels} pixel limit")
+        reduction = choose_reduction(width, height, target_size)
+
+    if isinstance(source, (str, Path)):
+        pixels = cv2.imread(str(source), flags[reduction])
+    else:
+        pixels = cv2.imdecode(np.frombuffer(source, np.uint8), flags[reduction])
+    if pixels is None:
+        raise ValueError("Could not decode image")
+
+    if size is None:
+        return DecodedImage(pixels, pixels.shape[1], pixels.shape[0], 1)
+    width, height = size
+    if (pixels.shape[1] >= pixels.shape[0]) != (width >= height):
+        width, height = height, width  # decoder applied an orientation the header didn't report
+    return DecodedImage(pixels, width, height, reduction)
@@ -0,0 +1,143 @@
+"""Inference admission control with backpressure and priority classes
+
+At most `max_inflight` forward passes run at once. Requests beyond that wait in
+a bounded queue ordered by priority class and arrival. Live camera frames are
+served before uploads, and uploads before bulk jobs. Requests that can't be
+served soon are rejected fast instead of piling up:
+
+- queue full                 -> 429 Too Many Requests
+- waited past the timeout    -> 503 Service Unavailable
+- bumped by a higher class   -> 503 Service Unavailable
+
+Each rejection carries a Retry-After estimate based on recent service times.
+"""
+import bisect
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes (lower value is served first)
+REALTIME = 0   # live camera frames
+UPLOAD = 1     # interactive uploads / new tickets
+BULK = 2       # bulk imports and background jobs
+
+PRIORITY_NAMES = {REALTIME: "realtime", UPLOAD: "upload", BULK: "bulk"}
+
+
+class Overloaded(Exception):
+    """Raised when an inference request is not admitted"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "bumped")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.bumped = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class InferenceGovernor:
+    """Bounded concurrency + bounded priority queue for model inference"""
+
+    def __init__(self, max_inflight=2, max_queue=16, queue_timeout=10.0):
+        self.max_inflight = max(1, int(max_inflight))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = []  # sorted by (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._service_time = 0.5  # EWMA of seconds per inference, for Retry-After
+        self._admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._rejected = {"queue_full": 0, "timeout": 0, "preempted": 0}
+
+    def queued(self):
+        with self._cond:
+            return len(self._waiters)
+
+    def _retry_after(self):
+        backlog = len(self._waiters) + self.in_flight
+        return max(1, math.ceil(self._service_time * backlog / self.max_inflight))
+
+    def _reject(self, reason, status_code, message):
+        self._rejected[reason] += 1
+        raise Overloaded(message, status_code, self._retry_after())
+
+    def acquire(self, priority=UPLOAD):
+        with self._cond:
+            if self.in_flight < self.max_inflight and not self._waiters:
+                self.in_flight += 1
+                self._admitted[PRIORITY_NAMES[priority]] += 1
+                return
+
+            if len(self._waiters) >= self.max_queue:
+                # A full queue still lets a higher class in by bumping the newest lowest-class waiter
+                worst = self._waiters[-1] if self._waiters else None
+                if worst is None or worst.priority <= priority:
+                    self._reject("queue_full", 429, "Inference queue is full, please retry later")
+                self._waiters.pop()
+                worst.bumped = True
+                self._cond.notify_all()
+
+            waiter = _Waiter(priority, next(self._seq))
+            bisect.insort(self._waiters, waiter)
+            deadline = time.monotonic() + self.queue_timeout
+            while True:
+                if waiter.bumped:
+                    self._reject("preempted", 503, "Inference capacity taken by higher-priority requests")
+                if self._waiters[0] is waiter and self.in_flight < self.max_inflight:
+                    self._waiters.pop(0)
+                    self.in_flight += 1
+                    self._admitted[PRIORITY_NAMES[priority]] += 1
+                    self._cond.notify_all()
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(waiter)
+                    self._cond.notify_all()
+                    self._reject("timeout", 503, "Timed out waiting for inference capacity")
+                self._cond.wait(remaining)
+
+    def release(self, seconds=None):
+        with self._cond:
+            self.in_flight -= 1
+            if seconds is not None:
+                self._service_time = 0.8 * self._service_time + 0.2 * seconds
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=UPLOAD):
+        """Hold one inference slot for the duration of the block"""
+        self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        with self._cond:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self._waiters:
+                queued[PRIORITY_NAMES[waiter.priority]] += 1
+            return {
+                "max_in_flight": self.max_inflight,
+                "in_flight": self.in_flight,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._waiters),
+                "queued": queued,
+                "admitted": dict(self._admitted),
+                "rejected": dict(self._rejected),
+                "mean_service_ms": round(self._service_time * 1000, 1),
+            }
@@ -0,0 +1,337 @@
+"""
+Concurrent Load Test
+Drives a realistic request mix against the API at a sweep of concurrency
+levels and reports throughput, latency percentiles and error rate per endpoint.
+
+By default the app is started in-process with a stub model (see stub_model.py)
+and a throwaway SQLite database, so no weights or MongoDB are needed. Pass
+--url to load-test an already running server instead (e.g. to compare the
+dev server against a production WSGI server or different worker counts).
+
+Usage:
+    python load_test.py
+    python load_test.py --concurrency 10 50 200 --duration 30 --model-latency-ms 80
+    python load_test.py --url http://localhost:5000 --label gunicorn-4w --output results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import requests
+
+# Default request mix (relative weights), roughly what a live deployment sees:
+# camera frames dominate, dashboards poll, uploads and new tickets are rarer.
+DEFAULT_MIX = {
+    "predict_frame": 50,
+    "predict": 10,
+    "tickets_create": 10,
+    "tickets_all": 15,
+    "dashboard_stats": 15,
+}
+
+ENDPOINT_PATHS = {
+    "predict_frame": "/predict_frame",
+    "predict": "/predict",
+    "tickets_create": "/api/tickets/create",
+    "tickets_all": "/api/tickets/all",
+    "dashboard_stats": "/api/dashboard/stats",
+}
+
+
+# --------------------------
+# Test fixtures
+# --------------------------
+def make_road_image(width, height, seed=0):
+    """Create a synthetic road-like JPEG (asphalt noise with a few dark cracks)"""
+    rng = np.random.default_rng(seed)
+    img = rng.normal(110, 18, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    for _ in range(6):
+        pts = rng.integers(0, [width, height], size=(4, 2)).astype(np.int32)
+        cv2.polylines(img, [pts], False, (35, 35, 35), int(rng.integers(2, 8)))
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes()
+
+
+def start_local_server(workdir, model_latency_ms):
+    """Start the app in a background thread with a stub model and SQLite storage"""
+    os.environ["DATABASE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = str(workdir / "load_test.db")
+
+    from werkzeug.serving import make_server
+    import app as api
+    from stub_model import StubModel
+
+    api.UPLOAD_FOLDER = workdir / "uploads"
+    api.OUTPUT_FOLDER = workdir / "outputs"
+    api.UPLOAD_FOLDER.mkdir(exist_ok=True)
+    api.OUTPUT_FOLDER.mkdir(exist_ok=True)
+    api.registry.register(api.DEFAULT_MODEL_NAME, StubModel(latency_ms=model_latency_ms), version="stub")
+    api.model_state = "ready"
+    flask_app = api.create_app(load_model=False)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def login(base_url, username, password):
+    response = requests.post(f"{base_url}/api/login",
+                             json={"username": username, "password": password}, timeout=30)
+    data = response.json()
+    if not data.get("success"):
+        raise RuntimeError(f"Login failed for {username}: {data.get('error')}")
+    return data["token"]
+
+
+def setup_accounts(base_url, admin_user, admin_password):
+    """Log in as admin and register a throwaway reporter account"""
+    admin_token = login(base_url, admin_user, admin_password)
+    suffix = f"{int(time.time())}_{random.randint(0, 9999)}"
+    username = f"loadtest_{suffix}"
+    password = "loadtest-password"
+    requests.post(f"{base_url}/api/register", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": password,
+        "full_name": "Load Test",
+    }, timeout=30)
+    user_token = login(base_url, username, password)
+    return admin_token, user_token
+
+
+# --------------------------
+# Request mix
+# --------------------------
+class RequestMix:
+    """Builds and sends one request of a given kind"""
+
+    def __init__(self, base_url, admin_token, user_token, upload_jpeg, frame_jpeg, mix, frame_output="image"):
+        self.base_url = base_url
+        self.frame_output = frame_output
+        self.admin_token = admin_token
+        self.user_token = user_token
+        self.upload_jpeg = upload_jpeg
+        self.frame_jpeg = frame_jpeg
+        self.kinds = [kind for kind, weight in mix.items() if weight > 0]
+        self.weights = [mix[kind] for kind in self.kinds]
+
+    def pick(self, rng):
+        return rng.choices(self.kinds, weights=self.weights)[0]
+
+    def send(self, session, kind, n):
+        url = self.base_url + ENDPOINT_PATHS[kind]
+        if kind == "predict_frame":
+            return session.post(url, data={"output": self.frame_output},
+                                files={"image": (f"frame_{n}.jpg", self.frame_jpeg, "image/jpeg")}, timeout=120)
+        if kind == "predict":
+            return session.post(url, files={"image": (f"upload_{n}.jpg", self.upload_jpeg, "image/jpeg")},
+                                timeout=120)
+        if kind == "tickets_create":
+            return session.post(url, data={
+                "token": self.user_token,
+                "title": f"Load test pothole {n}",
+                "description": "Synthetic ticket created by load_test.py",
+                "location": "Test Road",
+                "latitude": str(12.9 + random.random() / 100),
+                "longitude": str(77.5 + random.random() / 100),
+            }, files={"image": (f"ticket_{n}.jpg", self.upload_jpeg, "image/jpeg")}, timeout=120)
+        if kind == "tickets_all":
+            return session.post(url, json={"token": self.admin_token}, timeout=120)
+        if kind == "dashboard_stats":
+            token = self.admin_token if random.random() < 0.5 else self.user_token
+            return session.post(url, json={"token": token}, timeout=120)
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+def run_client(request_mix, client_id, start_barrier, window, samples):
+    """Send requests back-to-back until the window closes, recording each outcome"""
+    rng = random.Random(client_id)
+    session = requests.Session()
+    n = 0
+    start_barrier.wait()
+    while time.perf_counter() < window["deadline"]:
+        kind = request_mix.pick(rng)
+        n += 1
+        started = time.perf_counter()
+        try:
+            response = request_mix.send(session, kind, f"{client_id}_{n}")
+            ok = response.status_code < 400
+            status = response.status_code
+        except requests.RequestException as e:
+            ok = False
+            status = type(e).__name__
+        samples.append((kind, time.perf_counter() - started, ok, status))
+    session.close()
+
+
+# --------------------------
+# Statistics
+# --------------------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(np.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Aggregate raw samples into per-endpoint statistics"""
+    by_kind = {}
+    for kind, latency, ok, status in samples:
+        by_kind.setdefault(kind, []).append((latency, ok, status))
+    by_kind["ALL"] = [(latency, ok, status) for _, latency, ok, status in samples]
+
+    summary = {}
+    for kind, rows in by_kind.items():
+        latencies = sorted(latency * 1000 for latency, _, _ in rows)
+        errors = [status for _, ok, status in rows if not ok]
+        summary[kind] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "error_rate": round(len(errors) / len(rows), 4) if rows else 0.0,
+            "errors": {str(status): errors.count(status) for status in set(errors)},
+        }
+    return summary
+
+
+def print_summary(concurrency, summary):
+    print(f"\n[RESULT] concurrency={concurrency}")
+    print(f"   {'endpoint':<18}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for kind in list(ENDPOINT_PATHS) + ["ALL"]:
+        if kind not in summary:
+            continue
+        row = summary[kind]
+        print(f"   {kind:<18}{row['requests']:>8}{row['throughput_rps']:>10.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+              f"{row['error_rate'] * 100:>8.1f}%")
+
+
+def run_level(request_mix, concurrency, duration):
+    """Run one concurrency level and return its per-endpoint summary"""
+    # The window opens only once every client thread is ready, so slow thread
+    # start-up at high concurrency does not eat into the measured time.
+    start_barrier = threading.Barrier(concurrency + 1)
+    window = {}
+    per_client = [[] for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=run_client, daemon=True,
+                         args=(request_mix, client_id, start_barrier, window, per_client[client_id]))
+        for client_id in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    window["deadline"] = started + duration
+    start_barrier.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for client_samples in per_client for sample in client_samples]
+    return summarize(samples, elapsed)
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        mix = {kind: 0 for kind in DEFAULT_MIX}
+        for part in text.split(","):
+            kind, weight = part.split("=")
+            if kind not in ENDPOINT_PATHS:
+                raise SystemExit(f"Unknown endpoint in --mix: {kind} (choose from {', '.join(ENDPOINT_PATHS)})")
+            mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Road Damage API")
+    parser.add_argument("--url", help="Target an already running server instead of starting one in-process")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200],
+                        help="Concurrency levels to sweep (default: 10 50 200)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument("--mix", help="Request mix, e.g. predict_frame=50,predict=10,tickets_all=15")
+    parser.add_argument("--model-latency-ms", type=float, default=50.0,
+                        help="Simulated forward-pass time of the stub model (in-process mode only)")
+    parser.add_argument("--image-size", default="1920x1080", help="Upload image size WxH")
+    parser.add_argument("--frame-size", default="640x480", help="Camera frame size WxH")
+    parser.add_argument("--frame-output", choices=["image", "json", "binary"], default="image",
+                        help="/predict_frame response mode")
+    parser.add_argument("--admin-user", default="admin")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--label", default=None, help="Name of the serving mode, stored in --output")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ROAD DAMAGE DETECTION API - LOAD TEST")
+    print("=" * 60)
+
+    workdir = None
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+        mode = "remote"
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="road_damage_load_"))
+        base_url, server = start_local_server(workdir, args.model_latency_ms)
+        mode = "in-process (stub model, SQLite)"
+    print(f"[INFO] Target: {base_url} [{mode}]")
+
+    upload_w, upload_h = (int(v) for v in args.image_size.lower().split("x"))
+    frame_w, frame_h = (int(v) for v in args.frame_size.lower().split("x"))
+    admin_token, user_token = setup_accounts(base_url, args.admin_user, args.admin_password)
+    request_mix = RequestMix(base_url, admin_token, user_token,
+                             make_road_image(upload_w, upload_h, seed=1),
+                             make_road_image(frame_w, frame_h, seed=2),
+                             parse_mix(args.mix), args.frame_output)
+
+    # Warm up every endpoint once so first-request costs are not measured
+    with requests.Session() as session:
+        for kind in request_mix.kinds:
+            request_mix.send(session, kind, "warmup")
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"[INFO] Running {concurrency} concurrent clients for {args.duration:.0f}s...")
+        summary = run_level(request_mix, concurrency, args.duration)
+        print_summary(concurrency, summary)
+        results.append({"concurrency": concurrency, "endpoints": summary})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "label": args.label,
+                "target": base_url,
+                "mode": mode,
+                "duration_s": args.duration,
+                "mix": dict(zip(request_mix.kinds, request_mix.weights)),
+                "levels": results,
+            }, f, indent=2)
+        print(f"\n[SUCCESS] Results written to {args.output}")
+
+    if server is not None:
+        server.shutdown()
+
+    failed = any(level["endpoints"].get("ALL", {}).get("error_rate", 0) > 0 for level in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
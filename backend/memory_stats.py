@@ -0,0 +1,100 @@
+"""Per-endpoint memory accounting
+
+Every request records how much the process RSS grew while it ran (memory the
+request left behind: caches, allocator high-water marks, leaks). With
+MEMORY_STATS=tracemalloc the peak Python-heap allocation during the request
+is recorded as well; that costs some speed, so it is meant for staging and
+soak tests rather than production.
+
+Both numbers are process-wide: with several requests in flight, a request is
+also charged for what the others allocated meanwhile. Streaming endpoints
+(exports, event streams) are only measured up to the point the response
+starts. Results are served under "memory" in /metrics.
+"""
+import os
+import threading
+import time
+import tracemalloc
+
+from flask import g, request
+
+MODES = ("off", "rss", "tracemalloc")
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux), 0 where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class EndpointMemory:
+    """Collects memory counters per Flask endpoint"""
+
+    def __init__(self, mode="rss"):
+        if mode not in MODES:
+            raise ValueError(f"MEMORY_STATS must be one of {', '.join(MODES)}, got {mode!r}")
+        self.mode = mode
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._rss_start = rss_bytes()
+
+    def install(self, app):
+        if self.mode == "off":
+            return
+        if self.mode == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        app.before_request(self._before)
+        app.teardown_request(self._after)
+
+    def _before(self):
+        g.memory_rss = rss_bytes()
+        if self.mode == "tracemalloc":
+            tracemalloc.reset_peak()
+            g.memory_traced = tracemalloc.get_traced_memory()[0]
+
+    def _after(self, error=None):
+        if "memory_rss" not in g:
+            return
+        retained = rss_bytes() - g.memory_rss
+        peak = None
+        if self.mode == "tracemalloc":
+            peak = tracemalloc.get_traced_memory()[1] - g.memory_traced
+        self.record(request.endpoint or "unknown", retained, peak)
+
+    def record(self, endpoint, rss_retained, traced_peak=None):
+        with self._lock:
+            row = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "rss_retained_total": 0, "rss_retained_max": 0, "traced_peak_max": 0})
+            row["requests"] += 1
+            row["rss_retained_total"] += rss_retained
+            row["rss_retained_max"] = max(row["rss_retained_max"], rss_retained)
+            if traced_peak is not None:
+                row["traced_peak_max"] = max(row["traced_peak_max"], traced_peak)
+
+    def stats(self):
+        rss = rss_bytes()
+        with self._lock:
+            endpoints = {
+                name: {
+                    "requests": row["requests"],
+                    "rss_retained_mb": round(row["rss_retained_total"] / 1e6, 2),
+                    "rss_retained_max_mb": round(row["rss_retained_max"] / 1e6, 2),
+                    **({"traced_peak_max_mb": round(row["traced_peak_max"] / 1e6, 2)}
+                       if self.mode == "tracemalloc" else {}),
+                }
+                for name, row in sorted(self._endpoints.items())
+            }
+        stats = {
+            "mode": self.mode,
+            "rss_mb": round(rss / 1e6, 1),
+            "rss_growth_mb": round((rss - self._rss_start) / 1e6, 1),
+            "uptime_s": round(time.time() - self._started),
+            "endpoints": endpoints,
+        }
+        if self.mode == "tracemalloc":
+            stats["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 1e6, 1)
+        return stats
@@ -0,0 +1,307 @@
+"""Model registry: several named models / versions with hot reload and eviction
+
+Each model name (e.g. "yolo") can have several loaded versions, one of which
+is active. New weights are loaded in a background thread and activated by
+swapping a single reference, so requests already running finish on the
+version they started with. Versions that are neither active nor in use are
+evicted (least recently used first) when the total footprint exceeds the
+memory budget, and by a timer once they have been idle for idle_seconds.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+MB = 1024 * 1024
+
+
+def file_version(path):
+    """Short content hash of a weights file, used as its version string"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def estimate_model_memory(model, path=None):
+    """Bytes held by the model's parameters and buffers (file size as a fallback)"""
+    torch_module = getattr(model, "model", None)
+    try:
+        tensors = list(torch_module.parameters()) + list(torch_module.buffers())
+        total = sum(t.numel() * t.element_size() for t in tensors)
+        if total:
+            return total
+    except AttributeError:
+        pass  # not a torch model (exported backend or stub)
+    if path is not None and Path(path).exists():
+        return Path(path).stat().st_size
+    return 0
+
+
+class UnknownModelError(LookupError):
+    """Requested model name / version is not loaded"""
+
+
+class ModelVersion:
+    """One loaded version of a named model plus its usage statistics"""
+
+    def __init__(self, name, version, model, path=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.path = str(path) if path else None
+        self.memory_bytes = estimate_model_memory(model, path)
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.in_flight = 0
+        self.requests = 0
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.version}"
+
+    def latency_stats(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {"count": self.requests, "p50_ms": None, "p95_ms": None, "mean_ms": None}
+        return {
+            "count": self.requests,
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+            "mean_ms": round(float(np.mean(latencies)) * 1000, 1),
+        }
+
+
+class ModelRegistry:
+    """Thread-safe registry of named, versioned models"""
+
+    def __init__(self, loader, warmup=None, memory_budget_mb=2048, idle_seconds=600):
+        self.loader = loader
+        self.warmup = warmup
+        self.memory_budget_bytes = int(memory_budget_mb * MB)
+        self.idle_seconds = idle_seconds
+        self.default_name = None
+        self._models = {}    # name -> {version: ModelVersion}
+        self._active = {}    # name -> active version
+        self._loading = {}   # "name@version" -> "loading" / "failed: <error>"
+        self._lock = threading.RLock()
+        self._idle_timer = None
+        self._idle_due = None
+
+    # ---- loading & activation ----
+    def register(self, name, model, version, path=None, activate=True):
+        """Add an already loaded model"""
+        entry = ModelVersion(name, version, model, path)
+        with self._lock:
+            self._models.setdefault(name, {})[version] = entry
+            if activate or name not in self._active:
+                self._active[name] = version
+            if self.default_name is None:
+                self.default_name = name
+        self.enforce_budget()
+        return entry
+
+    def load(self, name, path, version=None, activate=True, warmup=True):
+        """Load weights from disk (blocking) and register them"""
+        version = version or file_version(path)
+        key = f"{name}@{version}"
+        with self._lock:
+            existing = self._models.get(name, {}).get(version)
+            if existing is not None:
+                self._loading.pop(key, None)  # load_async marked it before we got here
+        if existing is not None:
+            if activate:
+                self.activate(name, version)
+            return existing
+
+        with self._lock:
+            self._loading[key] = "loading"
+        try:
+            print(f"📦 Loading model {key} from: {path}")
+            model = self.loader(path)
+            if warmup and self.warmup is not None:
+                self.warmup(model)
+        except Exception as e:
+            with self._lock:
+                self._loading[key] = f"failed: {e}"
+            raise
+        with self._lock:
+            self._loading.pop(key, None)
+        entry = self.register(name, model, version, path=path, activate=activate)
+        print(f"✅ Model {key} loaded ({entry.memory_bytes / MB:.1f} MB){' and activated' if activate else ''}")
+        return entry
+
+    def load_async(self, name, path, version=None, activate=True):
+        """Load weights in a background thread; traffic switches once it's warmed up"""
+        version = version or file_version(path)
+
+        def _run():
+            try:
+                self.load(name, path, version=version, activate=activate)
+            except Exception as e:
+                print(f"❌ Error loading model {name}@{version}: {e}")
+
+        with self._lock:
+            self._loading[f"{name}@{version}"] = "loading"
+        threading.Thread(target=_run, name=f"load-{name}", daemon=True).start()
+        return version
+
+    def activate(self, name, version):
+        """Atomically switch new requests for `name` to `version`"""
+        with self._lock:
+            if version not in self._models.get(name, {}):
+                raise UnknownModelError(f"{name}@{version} is not loaded")
+            self._active[name] = version
+            self._schedule_idle_check()  # the previous version may now go idle
+        print(f"🔀 Model {name} now serving version {version}")
+
+    # ---- lookup ----
+    def has_active(self):
+        with self._lock:
+            return self.default_name in self._active
+
+    def get(self, name=None, version=None):
+        """Return the requested (or active / default) ModelVersion; KeyError if unknown"""
+        with self._lock:
+            name = name or self.default_name
+            versions = self._models.get(name)
+            if not versions:
+                raise UnknownModelError(f"Unknown model: {name}")
+            version = version or self._active.get(name)
+            if version not in versions:
+                raise UnknownModelError(f"Unknown version for {name}: {version}")
+            return versions[version]
+
+    def resolve(self, spec):
+        """Look up a "name" or "name@version" pin (None means the default model)"""
+        if not spec:
+            return self.get()
+        name, _, version = spec.partition("@")
+        return self.get(name, version or None)
+
+    @contextmanager
+    def use(self, spec=None):
+        """Check out a model version for one request and record its latency
+
+        The version is resolved and marked in use under the lock, so it can't
+        be evicted (or swapped out from under the request) until it's released.
+        """
+        with self._lock:
+            entry = self.resolve(spec)
+            entry.in_flight += 1
+            entry.last_used = time.time()
+        started = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+                entry.requests += 1
+                entry.latencies.append(time.perf_counter() - started)
+                entry.last_used = time.time()
+                if entry.in_flight == 0 and self._active.get(entry.name) != entry.version:
+                    self._schedule_idle_check()
+
+    def active_models(self):
+        with self._lock:
+            return [self._models[name][version] for name, version in self._active.items()]
+
+    # ---- eviction ----
+    def total_memory_bytes(self):
+        with self._lock:
+            return sum(entry.memory_bytes for versions in self._models.values() for entry in versions.values())
+
+    def _evictable(self):
+        """Inactive, unused versions, least recently used first"""
+        candidates = [
+            entry
+            for name, versions in self._models.items()
+            for version, entry in versions.items()
+            if self._active.get(name) != version and entry.in_flight == 0
+        ]
+        return sorted(candidates, key=lambda entry: entry.last_used)
+
+    def _evict(self, entry, reason):
+        del self._models[entry.name][entry.version]
+        if not self._models[entry.name]:
+            del self._models[entry.name]
+        print(f"🗑️ Evicted model {entry.key} ({reason}, freed {entry.memory_bytes / MB:.1f} MB)")
+
+    def enforce_budget(self):
+        """Evict idle versions, then LRU versions while over the memory budget"""
+        evicted = []
+        with self._lock:
+            now = time.time()
+            for entry in self._evictable():
+                if now - entry.last_used > self.idle_seconds:
+                    self._evict(entry, "idle")
+                    evicted.append(entry.key)
+            for entry in self._evictable():
+                if self.total_memory_bytes() <= self.memory_budget_bytes:
+                    break
+                self._evict(entry, "over memory budget")
+                evicted.append(entry.key)
+            self._schedule_idle_check()
+        return evicted
+
+    def _schedule_idle_check(self):
+        """Arm one timer for when the next evictable version goes idle (lock held)
+
+        A single timer per registry, re-armed after it fires, so a pinned old
+        version under traffic doesn't start a thread per request. A timer
+        inherited through fork isn't running in the child and is simply re-armed.
+        """
+        candidates = self._evictable()
+        if not candidates:
+            return
+        due = candidates[0].last_used + self.idle_seconds
+        timer = self._idle_timer
+        if timer is not None and timer.is_alive():
+            if self._idle_due <= due:
+                return  # fires early enough; it re-arms for the rest
+            timer.cancel()
+        self._idle_due = due
+        self._idle_timer = threading.Timer(max(0.0, due - time.time()) + 1, self._idle_check)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _idle_check(self):
+        with self._lock:
+            self._idle_timer = None
+        self.enforce_budget()  # re-arms for whatever is still evictable
+
+    # ---- reporting ----
+    def info(self):
+        with self._lock:
+            models = {}
+            for name, versions in self._models.items():
+                models[name] = {
+                    "active_version": self._active.get(name),
+                    "versions": [
+                        {
+                            "version": entry.version,
+                            "active": self._active.get(name) == entry.version,
+                            "path": entry.path,
+                            "task": getattr(entry.model, "task", None),
+                            "memory_mb": round(entry.memory_bytes / MB, 1),
+                            "loaded_at": entry.loaded_at,
+                            "last_used": entry.last_used,
+                            "in_flight": entry.in_flight,
+                            "latency": entry.latency_stats(),
+                        }
+                        for entry in versions.values()
+                    ],
+                }
+            return {
+                "default": self.default_name,
+                "models": models,
+                "loading": dict(self._loading),
+                "memory_used_mb": round(self.total_memory_bytes() / MB, 1),
+                "memory_budget_mb": round(self.memory_budget_bytes / MB, 1),
+            }
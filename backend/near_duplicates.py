@@ -0,0 +1,176 @@
+"""Near-duplicate detection for ticket photos
+
+Every ticket image gets a 64-bit perceptual hash (DCT pHash). Re-compressed,
+resized or slightly re-framed copies of the same photo land within a few bits
+of each other, unlike byte-level hashes. Recent hashes live in a BK-tree, so a
+Hamming-radius lookup only visits a small part of the index.
+
+A new photo counts as a duplicate of an earlier ticket when:
+  - the hashes are within `max_distance` bits,
+  - the earlier ticket is within `window_days`, and
+  - both were reported at a similar location (within `radius_m` metres, or the
+    same location text when either ticket has no coordinates).
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def perceptual_hash(pixels):
+    """64-bit DCT perceptual hash of a BGR or grayscale image, as 16 hex chars"""
+    import cv2
+
+    gray = cv2.cvtColor(pixels, cv2.COLOR_BGR2GRAY) if pixels.ndim == 3 else pixels
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # The DC term only encodes overall brightness; keep it out of the threshold
+    bits = low > np.median(low[1:])
+    return np.packbits(bits).tobytes().hex()
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        self._root = None  # [hash, items, {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """[(distance, item)] for every item within radius bits"""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend((d, item) for item in node[1])
+            # Triangle inequality: only subtrees at d-radius..d+radius can match
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return found
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace(" ", "T"))
+    except ValueError:
+        return None
+
+
+def _same_place(a, b, radius_m):
+    if None not in (a.get("latitude"), a.get("longitude"), b.get("latitude"), b.get("longitude")):
+        return distance_m(float(a["latitude"]), float(a["longitude"]),
+                          float(b["latitude"]), float(b["longitude"])) <= radius_m
+    location_a = (a.get("location") or "").strip().lower()
+    return bool(location_a) and location_a == (b.get("location") or "").strip().lower()
+
+
+class DuplicateIndex:
+    """In-memory index of recent ticket image hashes"""
+
+    def __init__(self, max_distance=8, radius_m=50.0, window_days=30):
+        self.max_distance = max_distance
+        self.radius_m = radius_m
+        self.window = timedelta(days=window_days)
+        self._tree = BKTree()
+        self._ids = set()
+        self._last_sync = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def add(self, ticket):
+        """Index a ticket dict that has id, image_phash, created_at and location fields"""
+        if not ticket.get("image_phash"):
+            return
+        with self._lock:
+            ticket_id = str(ticket["id"])
+            if ticket_id in self._ids:
+                return
+            self._ids.add(ticket_id)
+            self._tree.add(int(ticket["image_phash"], 16), ticket)
+
+    def find(self, image_phash, latitude=None, longitude=None, location=None):
+        """(ticket, hamming distance) of the closest recent match, or (None, None)"""
+        query = {"latitude": latitude, "longitude": longitude, "location": location}
+        cutoff = datetime.now() - self.window
+        with self._lock:
+            candidates = self._tree.search(int(image_phash, 16), self.max_distance)
+        matches = []
+        for distance, ticket in candidates:
+            created_at = _as_datetime(ticket.get("created_at"))
+            if created_at is None or created_at < cutoff:
+                continue
+            if _same_place(query, ticket, self.radius_m):
+                matches.append((distance, -created_at.timestamp(), ticket))
+        if not matches:
+            return None, None
+        distance, _, ticket = min(matches, key=lambda m: m[:2])  # closest hash, then newest
+        return ticket, distance
+
+    def sync(self, fetch_since, every_seconds=30):
+        """Pull tickets other processes created since the last sync
+
+        fetch_since(datetime) must return ticket dicts as accepted by add().
+        Stale entries are dropped by rebuilding the tree once per window.
+        """
+        now = datetime.now()
+        with self._lock:
+            if self._last_sync and (now - self._last_sync).total_seconds() < every_seconds:
+                return
+            if self._built_at is None or now - self._built_at > self.window:
+                self._tree = BKTree()
+                self._ids = set()
+                self._built_at = now
+                since = now - self.window
+            else:
+                # Overlap the previous sync a little; add() skips ids it already has
+                since = self._last_sync - timedelta(seconds=every_seconds)
+            self._last_sync = now
+        for ticket in fetch_since(since):
+            self.add(ticket)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexed": self._tree.size,
+                "max_distance": self.max_distance,
+                "radius_m": self.radius_m,
+                "window_days": self.window.days,
+            }
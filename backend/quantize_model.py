@@ -0,0 +1,273 @@
+"""
+INT8 Model Quantization
+Produces an INT8 ONNX variant of the YOLO segmentation model for CPU serving
+and only promotes it if it stays close to the FP32 model on our own images.
+
+Steps:
+  1. Export models/bestyolov.pt to ONNX (dynamic input shape).
+  2. Quantize it with ONNX Runtime: static (calibrated on --calib-dir images,
+     default) or dynamic (weights only, no calibration needed).
+  3. Run FP32 and INT8 over --reference-dir and compare union-mask IoU,
+     percentage_damage and detection counts per image.
+  4. If drift is within the thresholds the candidate is promoted to
+     models/bestyolov_int8.onnx; otherwise it is discarded and the script
+     exits non-zero. Serve the promoted model with MODEL_VARIANT=int8.
+
+Usage:
+    python quantize_model.py --calib-dir data/calib --reference-dir data/reference
+    python quantize_model.py --mode dynamic --reference-dir uploads
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import config
+from memory_stats import rss_bytes
+from resolution import letterbox_shape
+from segmentation import load_yolo_weights, calculate_damage_area
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def list_images(folder, limit=None):
+    images = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return images[:limit] if limit else images
+
+
+# --------------------------
+# Export & quantization
+# --------------------------
+def export_onnx(pt_path, imgsz):
+    model = load_yolo_weights(pt_path)
+    # dynamic=True keeps the input shape free for the rectangular / adaptive sizes
+    onnx_path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    return Path(onnx_path)
+
+
+def preprocess(img, imgsz):
+    """Letterbox + normalise exactly like ultralytics does for an ONNX model"""
+    h, w = letterbox_shape(img.shape[0], img.shape[1], imgsz)
+    scale = min(h / img.shape[0], w / img.shape[1])
+    resized = cv2.resize(img, (round(img.shape[1] * scale), round(img.shape[0] * scale)),
+                         interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((h, w, 3), 114, dtype=np.uint8)
+    top = (h - resized.shape[0]) // 2
+    left = (w - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0  # BGR -> RGB, HWC -> CHW
+    return np.ascontiguousarray(blob[None])
+
+
+def make_calibration_reader(onnx_path, images, imgsz):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(images)
+
+        def get_next(self):
+            path = next(self._images, None)
+            if path is None:
+                return None
+            return {input_name: preprocess(cv2.imread(str(path)), imgsz)}
+
+    return ImageReader()
+
+
+def quantize(onnx_path, out_path, mode, calib_images, imgsz):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if mode == "dynamic":
+        quantize_dynamic(str(onnx_path), str(out_path), weight_type=QuantType.QUInt8)
+        return
+
+    # Shape inference + graph cleanup improves static quantization coverage
+    prepared = onnx_path.with_suffix(".prep.onnx")
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(str(onnx_path), str(prepared))
+    except Exception as e:
+        print(f"   [WARNING] Pre-processing skipped: {e}")
+        prepared = onnx_path
+
+    quantize_static(
+        str(prepared), str(out_path),
+        make_calibration_reader(prepared, calib_images, imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    if prepared != onnx_path:
+        prepared.unlink(missing_ok=True)
+
+
+# --------------------------
+# Accuracy gate
+# --------------------------
+def union_mask(result, shape):
+    """Rasterise all predicted mask polygons into one binary mask at image size"""
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    if result.masks is not None:
+        polygons = [p.astype(np.int32) for p in result.masks.xy if len(p) >= 3]
+        if polygons:
+            cv2.fillPoly(mask, polygons, 1)
+    return mask
+
+
+def evaluate(model, images, imgsz, conf):
+    """Per-image predictions (union mask, damage %, count) plus latency"""
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)  # warm-up
+    outputs, latencies = [], []
+    for path in images:
+        img = cv2.imread(str(path))
+        shape = letterbox_shape(img.shape[0], img.shape[1], imgsz)
+        started = time.perf_counter()
+        result = model.predict(img, conf=conf, imgsz=list(shape), verbose=False)[0]
+        latencies.append(time.perf_counter() - started)
+        _, percentage_damage, _ = calculate_damage_area(result.masks, img.shape)
+        outputs.append({
+            "mask": union_mask(result, img.shape),
+            "percentage_damage": percentage_damage,
+            "detections": len(result.masks) if result.masks is not None else 0,
+        })
+    return outputs, {
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+    }
+
+
+def compare(reference, candidate):
+    ious, damage_drift, count_mismatch = [], [], 0
+    for ref, cand in zip(reference, candidate):
+        union = np.logical_or(ref["mask"], cand["mask"]).sum()
+        inter = np.logical_and(ref["mask"], cand["mask"]).sum()
+        ious.append(1.0 if union == 0 else inter / union)
+        damage_drift.append(abs(ref["percentage_damage"] - cand["percentage_damage"]))
+        count_mismatch += ref["detections"] != cand["detections"]
+    return {
+        "images": len(reference),
+        "mean_mask_iou": round(float(np.mean(ious)), 4),
+        "min_mask_iou": round(float(np.min(ious)), 4),
+        "mean_damage_drift_pp": round(float(np.mean(damage_drift)), 3),
+        "max_damage_drift_pp": round(float(np.max(damage_drift)), 3),
+        "detection_count_mismatch_rate": round(count_mismatch / len(reference), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and gate an INT8 CPU variant of the YOLO model")
+    parser.add_argument("--weights", default=str(config.MODELS_FOLDER / "bestyolov.pt"))
+    parser.add_argument("--output", default=str(config.INT8_MODEL_PATH))
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--calib-dir", default=str(config.UPLOAD_FOLDER), help="Calibration images (static mode)")
+    parser.add_argument("--calib-count", type=int, default=200)
+    parser.add_argument("--reference-dir", default=str(config.UPLOAD_FOLDER), help="Images for the accuracy gate")
+    parser.add_argument("--reference-count", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=config.YOLO_CONFIDENCE_THRESHOLD,
+                        help="Confidence threshold (default: the served CONF_THRESHOLD)")
+    parser.add_argument("--min-mean-iou", type=float, default=0.90)
+    parser.add_argument("--max-mean-damage-drift", type=float, default=1.0, help="Percentage points")
+    parser.add_argument("--max-count-mismatch", type=float, default=0.10, help="Fraction of images")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ROAD DAMAGE DETECTION - INT8 QUANTIZATION")
+    print("=" * 60)
+
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("[ERROR] onnxruntime is required: pip install onnx onnxruntime")
+        return 1
+
+    reference_images = list_images(args.reference_dir, args.reference_count)
+    calib_images = list_images(args.calib_dir, args.calib_count)
+    if Path(args.calib_dir).resolve() == Path(args.reference_dir).resolve():
+        # Same folder: calibrate and evaluate on disjoint halves
+        all_images = list_images(args.reference_dir)
+        calib_images = all_images[0::2][:args.calib_count]
+        reference_images = all_images[1::2][:args.reference_count]
+    if not reference_images or (args.mode == "static" and not calib_images):
+        print("[ERROR] Need calibration and reference images (see --calib-dir / --reference-dir)")
+        return 1
+
+    output = Path(args.output)
+    candidate = output.with_name(output.stem + ".candidate.onnx")
+
+    print(f"[1] Exporting {args.weights} to ONNX...")
+    onnx_path = export_onnx(args.weights, args.imgsz)
+
+    print(f"[2] Quantizing ({args.mode}, {len(calib_images)} calibration images)...")
+    quantize(onnx_path, candidate, args.mode, calib_images, args.imgsz)
+
+    print(f"[3] Comparing FP32 and INT8 on {len(reference_images)} reference images...")
+    rss_before = rss_bytes()
+    fp32_model = load_yolo_weights(args.weights)
+    fp32_rss = rss_bytes() - rss_before
+    fp32_out, fp32_latency = evaluate(fp32_model, reference_images, args.imgsz, args.conf)
+    del fp32_model
+
+    rss_before = rss_bytes()
+    int8_model = load_yolo_weights(candidate)
+    int8_rss = rss_bytes() - rss_before
+    int8_out, int8_latency = evaluate(int8_model, reference_images, args.imgsz, args.conf)
+
+    drift = compare(fp32_out, int8_out)
+    failures = []
+    if drift["mean_mask_iou"] < args.min_mean_iou:
+        failures.append(f"mean mask IoU {drift['mean_mask_iou']} < {args.min_mean_iou}")
+    if drift["mean_damage_drift_pp"] > args.max_mean_damage_drift:
+        failures.append(f"mean damage drift {drift['mean_damage_drift_pp']}pp > {args.max_mean_damage_drift}pp")
+    if drift["detection_count_mismatch_rate"] > args.max_count_mismatch:
+        failures.append(f"count mismatch rate {drift['detection_count_mismatch_rate']} > {args.max_count_mismatch}")
+
+    report = {
+        "mode": args.mode,
+        "weights": str(args.weights),
+        "drift": drift,
+        "thresholds": {
+            "min_mean_iou": args.min_mean_iou,
+            "max_mean_damage_drift_pp": args.max_mean_damage_drift,
+            "max_count_mismatch": args.max_count_mismatch,
+        },
+        "fp32": {"latency": fp32_latency, "file_mb": round(Path(args.weights).stat().st_size / 1e6, 1),
+                 "rss_delta_mb": round(fp32_rss / 1e6, 1)},
+        "int8": {"latency": int8_latency, "file_mb": round(candidate.stat().st_size / 1e6, 1),
+                 "rss_delta_mb": round(int8_rss / 1e6, 1)},
+        "promoted": not failures,
+        "failures": failures,
+    }
+
+    print(f"   [INFO] FP32: {fp32_latency['mean_ms']} ms mean / {fp32_latency['p95_ms']} ms p95, "
+          f"{report['fp32']['file_mb']} MB")
+    print(f"   [INFO] INT8: {int8_latency['mean_ms']} ms mean / {int8_latency['p95_ms']} ms p95, "
+          f"{report['int8']['file_mb']} MB")
+    print(f"   [INFO] Drift: {json.dumps(drift)}")
+
+    with open(output.with_suffix(".report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    if failures:
+        candidate.unlink(missing_ok=True)
+        print("[ERROR] INT8 variant NOT promoted: " + "; ".join(failures))
+        return 1
+
+    candidate.replace(output)
+    print(f"[SUCCESS] Promoted INT8 model to {output}")
+    print("   Serve it with: MODEL_VARIANT=int8 python app.py")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Ticket Re-scoring Backfill
+After new weights are deployed, stored tickets still carry the
+damage_percentage, priority and annotated image of the model that scored
+them. This job re-runs the active model over the stored ticket images and
+updates those fields, recording the model version ("name@version") on each
+ticket.
+
+  - Tickets are read in id order, BULK_BATCH_SIZE at a time, skipping
+    the ones the target version already scored.
+  - Each batch goes through batched inference at the governor's BULK
+    priority (live camera frames and uploads go first), and is written back
+    with one bulk update. Items refused while the server is busy are retried
+    on their own after a pause.
+  - Annotated images replaced by a re-score are deleted once no ticket
+    points to them.
+  - Progress is checkpointed to RESCORE_CHECKPOINT after every batch, so a
+    restarted job resumes where it stopped.
+  - At most RESCORE_MAX_PER_SECOND images per second are scored.
+
+Run one job at a time, either from the API (admin: POST /models/rescore) or
+standalone with the configured weights:
+    python rescore.py
+    python rescore.py --max-per-second 10 --restart
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import config
+from image_io import ImageTooLarge
+from inference_governor import Overloaded
+
+# A "running" checkpoint not updated for this long belongs to a dead process
+STALE_CHECKPOINT_SECONDS = 120
+
+
+class RescoreJob:
+    """Checkpointed, throttled re-scoring of stored tickets (one run at a time)
+
+    The serving process hands in its own registry, batch inference function
+    (which goes through its governor), storage and heatmap module, so a job
+    started from the API runs on the models and admission control of the
+    process that serves the requests.
+    """
+
+    def __init__(self, checkpoint_path, registry, score_batch, load_image, database, heatmap,
+                 output_folder, conf, batch_size=8, max_per_second=2.0):
+        self.checkpoint_path = Path(checkpoint_path)
+        self.registry = registry
+        self.score_batch = score_batch  # (images, conf, model_spec) -> outcome per image
+        self.load_image = load_image
+        self.database = database
+        self.heatmap = heatmap
+        self.output_folder = Path(output_folder)
+        self.conf = conf
+        self.batch_size = batch_size
+        self.max_per_second = max_per_second
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._state = self._load_checkpoint() or {"state": "idle"}
+
+    # --------------------------
+    # Checkpoint
+    # --------------------------
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._state, f, indent=2)
+        tmp.replace(self.checkpoint_path)
+
+    def _running_elsewhere(self, checkpoint):
+        """Another process (worker or CLI) updated a running checkpoint recently"""
+        if not checkpoint or checkpoint.get("state") != "running" or not checkpoint.get("updated_at"):
+            return False
+        age = datetime.now() - datetime.fromisoformat(checkpoint["updated_at"])
+        return age.total_seconds() < STALE_CHECKPOINT_SECONDS
+
+    # --------------------------
+    # Control
+    # --------------------------
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, model_spec=None, restart=False):
+        """Run in a background thread; False if a run is already going"""
+        with self._lock:
+            if self.running() or self._running_elsewhere(self._load_checkpoint()):
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, args=(model_spec, restart),
+                                            name="rescore", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop after the current batch (the checkpoint keeps the progress)"""
+        self._stop.set()
+
+    def status(self):
+        """Progress of this process's run, else of the last checkpoint (another worker's)"""
+        with self._lock:
+            if self.running():
+                return dict(self._state, running=True)
+        checkpoint = self._load_checkpoint() or self._state
+        return dict(checkpoint, running=self._running_elsewhere(checkpoint))
+
+    # --------------------------
+    # Job
+    # --------------------------
+    def _remove_outputs(self, filenames):
+        """Delete annotated images no ticket points to any more
+
+        Duplicate tickets share their original's annotated image, so a file is
+        kept while any ticket still references it.
+        """
+        filenames = {name for name in filenames if name}
+        for name in filenames - self.database.get_referenced_outputs(filenames):
+            try:
+                (self.output_folder / name).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"⚠️ Could not remove {name}: {e}")
+
+    def run(self, model_spec=None, restart=False):
+        """Re-score every ticket the target model version hasn't scored (blocking)"""
+        model_version = self.registry.resolve(model_spec).key
+        checkpoint = self._load_checkpoint()
+        with self._lock:
+            if checkpoint and checkpoint.get("model_version") == model_version and not restart:
+                self._state = dict(checkpoint, state="running")
+                print(f"♻️ Resuming re-score for {model_version} after ticket {checkpoint.get('last_id')}")
+            else:
+                self._state = {"model_version": model_version, "last_id": None, "scored": 0,
+                               "failed": 0, "started_at": datetime.now().isoformat(), "state": "running"}
+            self._state["updated_at"] = datetime.now().isoformat()
+            self._save_checkpoint()
+        print(f"🔁 Re-scoring tickets with {model_version}...")
+
+        min_seconds_per_image = 1.0 / self.max_per_second if self.max_per_second else 0.0
+        while not self._stop.is_set():
+            tickets = self.database.get_tickets_to_rescore(model_version, self._state["last_id"], self.batch_size)
+            if not tickets:
+                break
+            batch_started = time.perf_counter()
+
+            pending = []  # (ticket, decoded image) still to score
+            for ticket in tickets:
+                try:
+                    pending.append((ticket, self.load_image(Path(ticket["image_path"]))))
+                except (ValueError, ImageTooLarge) as e:
+                    print(f"⚠️ Ticket {ticket['id']}: image not readable ({e}), skipped")
+
+            scored = []  # (ticket, outcome)
+            while pending:
+                outcomes = self.score_batch([image for _, image in pending], self.conf, model_version)
+                retry = [entry for entry, outcome in zip(pending, outcomes) if isinstance(outcome, Overloaded)]
+                scored += [(entry[0], outcome) for entry, outcome in zip(pending, outcomes)
+                           if not isinstance(outcome, Overloaded)]
+                pending = retry
+                # Live traffic has the slots: back off, then retry only the items it refused
+                if pending and self._stop.wait(5):
+                    break
+
+            updates, rescored = [], {}
+            for ticket, outcome in scored:
+                if isinstance(outcome, Exception) or outcome[1] is None:
+                    print(f"⚠️ Ticket {ticket['id']}: re-score failed ({outcome})")
+                    continue
+                out_filename, damage_stats = outcome
+                updates.append({"id": ticket["id"], "damage_data": damage_stats,
+                                "annotated_image_path": out_filename, "model_version": model_version})
+                rescored[ticket["id"]] = dict(ticket,
+                                              previous_annotated_image_path=ticket.get("annotated_image_path"),
+                                              previous_damage_percentage=ticket.get("damage_percentage"),
+                                              previous_priority=ticket.get("priority"),
+                                              annotated_image_path=out_filename,
+                                              damage_percentage=damage_stats["percentage_damage"],
+                                              priority=self.database.priority_for(damage_stats["percentage_damage"]))
+
+            updated = set(self.database.update_ticket_scores(updates))
+            self.heatmap.record_many(self.database, "ticket_rescored",
+                                    [ticket for ticket_id, ticket in rescored.items() if ticket_id in updated])
+            self._remove_outputs(
+                # Superseded outputs of updated tickets, new outputs of the ones that weren't
+                [ticket["previous_annotated_image_path"] if ticket_id in updated else ticket["annotated_image_path"]
+                 for ticket_id, ticket in rescored.items()]
+            )
+
+            with self._lock:
+                # Tickets still refused when stopping stay unscored and are picked up on resume
+                if not pending:
+                    self._state["last_id"] = tickets[-1]["id"]
+                self._state["scored"] += len(updated)
+                self._state["failed"] += len(tickets) - len(updated) - len(pending)
+                self._state["updated_at"] = datetime.now().isoformat()
+                self._save_checkpoint()
+
+            # Throttle: spread the batch over at least batch size / max_per_second
+            remaining = len(tickets) * min_seconds_per_image - (time.perf_counter() - batch_started)
+            if remaining > 0:
+                self._stop.wait(remaining)
+
+        with self._lock:
+            self._state["state"] = "stopped" if self._stop.is_set() else "done"
+            self._state["updated_at"] = datetime.now().isoformat()
+            self._save_checkpoint()
+        print(f"✅ Re-score {self._state['state']}: {self._state['scored']} tickets updated, "
+              f"{self._state['failed']} failed")
+        return self._state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored tickets with the current model")
+    parser.add_argument("--batch-size", type=int, default=config.BULK_BATCH_SIZE)
+    parser.add_argument("--max-per-second", type=float, default=config.RESCORE_MAX_PER_SECOND,
+                        help="Images scored per second at most (0 = unthrottled)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first ticket")
+    args = parser.parse_args()
+
+    # The standalone run is the only process here, so it builds the app's
+    # components itself and uses the job app.py wires up
+    import app as api
+
+    print("[INFO] Loading database and model...")
+    api.database.init_db()
+    api.load_models(warmup=False)
+    if not api.registry.has_active():
+        print("[ERROR] No model loaded")
+        return 1
+
+    job = api.rescore_job
+    job.batch_size = args.batch_size
+    job.max_per_second = args.max_per_second
+    try:
+        state = job.run(restart=args.restart)
+    except KeyboardInterrupt:
+        print("[INFO] Interrupted; run again to resume from the checkpoint")
+        return 1
+    print(f"[SUCCESS] {state['scored']} tickets re-scored with {state['model_version']}")
+    return 0 if state["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
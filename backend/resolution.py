@@ -0,0 +1,110 @@
+"""Latency-SLO-driven choice of inference resolution
+
+The controller keeps a window of recent inference latencies. When the p95 of
+that window exceeds the latency target it steps down to the next smaller input
+size (e.g. 640 -> 480 -> 320). When p95 is comfortably below the target it
+steps back up. A deep inference queue steps an individual request down
+immediately, without waiting for latencies to catch up.
+"""
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+STRIDE = 32  # YOLO input sides must be multiples of the max stride
+
+
+def letterbox_shape(height, width, size, stride=STRIDE):
+    """Rectangular inference shape (h, w) for an image, with minimal padding
+
+    The long side is scaled to `size` (never upscaled past the image itself) and
+    the short side keeps the aspect ratio, rounded up to a multiple of `stride`.
+    A 1280x720 camera frame at 640 runs as 384x640 instead of 640x640.
+    """
+    size = min(size, math.ceil(max(height, width) / stride) * stride)
+    scale = size / max(height, width)
+    return (
+        max(stride, math.ceil(height * scale / stride) * stride),
+        max(stride, math.ceil(width * scale / stride) * stride),
+    )
+
+
+class ResolutionController:
+    """Chooses the inference size per request from a latency target"""
+
+    def __init__(self, sizes=(640, 480, 320), target_ms=500.0, headroom=0.6,
+                 queue_depth_limit=4, window=50, min_samples=20, enabled=True):
+        self.sizes = sorted(sizes, reverse=True)
+        self.target_ms = target_ms
+        self.headroom = headroom
+        self.queue_depth_limit = queue_depth_limit
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self.level = 0  # index into self.sizes
+        self._window = deque(maxlen=window)
+        self._per_size = {size: {"count": 0, "total_ms": 0.0} for size in self.sizes}
+        self._lock = threading.Lock()
+
+    @property
+    def current_size(self):
+        return self.sizes[self.level]
+
+    def choose(self, queue_depth=0, max_size=None):
+        """Inference size for the next request
+
+        `max_size` lets a client ask for at most that resolution.
+        """
+        with self._lock:
+            level = self.level if self.enabled else 0
+            if self.enabled and queue_depth > self.queue_depth_limit:
+                level = min(level + 1, len(self.sizes) - 1)
+            size = self.sizes[level]
+        if max_size:
+            size = min(size, max(STRIDE, int(max_size)))
+        return size
+
+    def record(self, size, seconds):
+        """Feed back the latency of one inference and adjust the level"""
+        latency_ms = seconds * 1000
+        with self._lock:
+            stats = self._per_size.setdefault(size, {"count": 0, "total_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += latency_ms
+
+            # Only samples at the current level say anything about it
+            if size != self.current_size:
+                return
+            self._window.append(latency_ms)
+            if not self.enabled or len(self._window) < self.min_samples:
+                return
+
+            p95 = float(np.percentile(self._window, 95))
+            if p95 > self.target_ms and self.level < len(self.sizes) - 1:
+                self._set_level(self.level + 1, p95)
+            elif p95 < self.target_ms * self.headroom and self.level > 0:
+                self._set_level(self.level - 1, p95)
+
+    def _set_level(self, level, p95):
+        old_size = self.current_size
+        self.level = level
+        self._window.clear()
+        print(f"📐 Inference size {old_size} -> {self.current_size} (p95 {p95:.0f} ms, target {self.target_ms:.0f} ms)")
+
+    def stats(self):
+        with self._lock:
+            window = list(self._window)
+            return {
+                "adaptive": self.enabled,
+                "current_size": self.current_size,
+                "sizes": self.sizes,
+                "latency_target_ms": self.target_ms,
+                "recent_p95_ms": round(float(np.percentile(window, 95)), 1) if window else None,
+                "per_size": {
+                    str(size): {
+                        "count": stats["count"],
+                        "mean_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else None,
+                    }
+                    for size, stats in self._per_size.items()
+                },
+            }
@@ -0,0 +1,66 @@
+"""YOLO weight loading and damage-area maths
+
+Shared by the API and the offline scripts (quantize_model.py,
+sweep_settings.py), which need these helpers without importing app.py and
+its module-level setup (database connection, upload folders, the model
+registry).
+"""
+import numpy as np
+
+
+def _register_safe_globals():
+    """Add Ultralytics classes to PyTorch safe globals (for PyTorch 2.6+)"""
+    try:
+        import torch
+        from ultralytics.nn.tasks import SegmentationModel, DetectionModel
+        torch.serialization.add_safe_globals([SegmentationModel, DetectionModel])
+    except Exception:
+        pass  # Older PyTorch versions don't need this
+
+
+def load_yolo_weights(path):
+    """Registry loader for YOLO weights (.pt, or an exported .onnx variant)"""
+    from ultralytics import YOLO
+    _register_safe_globals()
+    return YOLO(str(path), task="segment")
+
+
+def calculate_damage_area(masks, image_shape):
+    """Calculate total damage area from segmentation masks"""
+    import cv2
+    if masks is None or len(masks) == 0:
+        return 0, 0, []
+    
+    total_area = 0
+    image_area = image_shape[0] * image_shape[1]
+    mask_areas = []
+    
+    # Mask polygons are already scaled to original image pixels, so the areas
+    # don't depend on the resolution inference ran at
+    if hasattr(masks, 'xy'):
+        for polygon in masks.xy:
+            area = cv2.contourArea(polygon.astype(np.float32)) if len(polygon) >= 3 else 0.0
+            mask_areas.append(area)
+            total_area += area
+        percentage_damage = (total_area / image_area) * 100 if image_area > 0 else 0
+        return total_area, percentage_damage, mask_areas
+    
+    # Convert masks to numpy if needed
+    masks_np = masks.data.cpu().numpy() if hasattr(masks, 'data') else masks
+    
+    for mask in masks_np:
+        # Convert to binary mask
+        binary_mask = (mask > 0).astype(np.uint8) * 255
+        
+        # Find contours
+        contours, _ = cv2.findContours(binary_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        
+        if contours:
+            # Calculate area of the largest contour
+            area = cv2.contourArea(contours[0])
+            mask_areas.append(area)
+            total_area += area
+    
+    percentage_damage = (total_area / image_area) * 100 if image_area > 0 else 0
+    
+    return total_area, percentage_damage, mask_areas
@@ -0,0 +1,158 @@
+"""
+Memory Soak Test
+Sends thousands of requests (the load_test.py mix) to the app running
+in-process with the stub model and fails if memory keeps growing.
+
+After a warm-up (model caches, allocator arenas, first-request imports) the
+RSS and the traced Python heap are recorded, the requests are sent in chunks,
+and the growth is compared with the limits once garbage has been collected.
+The biggest tracemalloc growth sites are printed so a leak can be traced to
+a line of code. Runs with MALLOC_ARENA_MAX=2 unless it is already set.
+
+Usage:
+    python soak_test.py
+    python soak_test.py --requests 10000 --concurrency 8 --max-growth-mb 32
+    python soak_test.py --mix predict=1 --image-size 4000x3000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+
+import requests
+
+from load_test import (RequestMix, make_road_image, parse_mix, setup_accounts,
+                       start_local_server)
+from memory_stats import rss_bytes
+
+
+def send_batch(request_mix, total, concurrency, offset):
+    """Send `total` requests from `concurrency` threads; returns the failed (kind, status) pairs"""
+    counter = iter(range(offset, offset + total))
+    lock = threading.Lock()
+    failures = []
+
+    def client(client_id):
+        rng = random.Random(client_id + offset)
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                kind = request_mix.pick(rng)
+                try:
+                    response = request_mix.send(session, kind, f"soak_{n}")
+                    if response.status_code >= 400:
+                        failures.append((kind, response.status_code))
+                except requests.RequestException as e:
+                    failures.append((kind, type(e).__name__))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return failures
+
+
+def settled_memory():
+    gc.collect()
+    return rss_bytes(), tracemalloc.get_traced_memory()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory soak test for the Road Damage API (in-process, stub model)")
+    parser.add_argument("--requests", type=int, default=3000, help="Requests to send after the warm-up")
+    parser.add_argument("--warmup", type=int, default=300, help="Requests sent before the baseline is taken")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=10, help="Memory samples taken during the run")
+    parser.add_argument("--mix", help="Request mix, e.g. predict_frame=50,predict=10 (see load_test.py)")
+    parser.add_argument("--model-latency-ms", type=float, default=5.0)
+    parser.add_argument("--image-size", default="1920x1080", help="Upload image size WxH")
+    parser.add_argument("--frame-size", default="640x480", help="Camera frame size WxH")
+    parser.add_argument("--max-growth-mb", type=float, default=64.0,
+                        help="Fail if RSS grows more than this after the warm-up")
+    parser.add_argument("--max-traced-growth-mb", type=float, default=16.0,
+                        help="Fail if the traced Python heap grows more than this after the warm-up")
+    parser.add_argument("--top", type=int, default=10, help="Growth sites to print")
+    parser.add_argument("--admin-user", default="admin")
+    parser.add_argument("--admin-password", default="admin123")
+    args = parser.parse_args()
+
+    # glibc gives each thread its own malloc arena, and freed image buffers left
+    # fragmented across them read as RSS growth. Measure with the arena count
+    # production should run with (it is read at process start, hence the re-exec).
+    if "MALLOC_ARENA_MAX" not in os.environ:
+        os.environ["MALLOC_ARENA_MAX"] = "2"
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    print("=" * 60)
+    print("ROAD DAMAGE DETECTION API - MEMORY SOAK TEST")
+    print("=" * 60)
+
+    tracemalloc.start(10)
+    workdir = Path(tempfile.mkdtemp(prefix="road_damage_soak_"))
+    base_url, server = start_local_server(workdir, args.model_latency_ms)
+    print(f"[INFO] Target: {base_url} [in-process (stub model, SQLite)]")
+
+    upload_w, upload_h = (int(v) for v in args.image_size.lower().split("x"))
+    frame_w, frame_h = (int(v) for v in args.frame_size.lower().split("x"))
+    admin_token, user_token = setup_accounts(base_url, args.admin_user, args.admin_password)
+    request_mix = RequestMix(base_url, admin_token, user_token,
+                             make_road_image(upload_w, upload_h, seed=1),
+                             make_road_image(frame_w, frame_h, seed=2),
+                             parse_mix(args.mix))
+
+    print(f"[INFO] Warming up with {args.warmup} requests...")
+    send_batch(request_mix, args.warmup, args.concurrency, 0)
+    rss_start, traced_start = settled_memory()
+    snapshot_start = tracemalloc.take_snapshot()
+    print(f"[INFO] Baseline: RSS {rss_start / 1e6:.1f} MB, traced {traced_start / 1e6:.1f} MB")
+
+    failures = []
+    sent = 0
+    chunk = max(1, args.requests // args.chunks)
+    print(f"   {'requests':>10}{'RSS MB':>10}{'traced MB':>12}")
+    while sent < args.requests:
+        size = min(chunk, args.requests - sent)
+        failures += send_batch(request_mix, size, args.concurrency, args.warmup + sent)
+        sent += size
+        rss, traced = settled_memory()
+        print(f"   {sent:>10}{rss / 1e6:>10.1f}{traced / 1e6:>12.1f}")
+
+    rss_end, traced_end = settled_memory()
+    snapshot_end = tracemalloc.take_snapshot()
+    server.shutdown()
+
+    rss_growth = (rss_end - rss_start) / 1e6
+    traced_growth = (traced_end - traced_start) / 1e6
+    print(f"\n[RESULT] {sent} requests, {len(failures)} failed")
+    print(f"   RSS growth:    {rss_growth:+.1f} MB (limit {args.max_growth_mb:.0f} MB)")
+    print(f"   Traced growth: {traced_growth:+.1f} MB (limit {args.max_traced_growth_mb:.0f} MB)")
+
+    print(f"\n[INFO] Top {args.top} growth sites:")
+    for stat in snapshot_end.compare_to(snapshot_start, "lineno")[:args.top]:
+        print(f"   {stat}")
+
+    if failures:
+        statuses = {}
+        for kind, status in failures:
+            statuses[f"{kind} {status}"] = statuses.get(f"{kind} {status}", 0) + 1
+        print(f"\n[WARNING] Failed requests: {statuses}")
+
+    if rss_growth > args.max_growth_mb or traced_growth > args.max_traced_growth_mb:
+        print("\n[ERROR] Memory kept growing during the soak test")
+        return 1
+    print("\n[SUCCESS] Memory stayed flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
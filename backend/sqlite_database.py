@@ -0,0 +1,713 @@
+"""SQLite database for Road Damage Management System (local / test storage)
+
+Mirrors the function interface of database.py so app.py can run without a
+MongoDB connection. Uses the same schema as the original road_damage.db.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+import hashlib
+import secrets
+
+import config
+
+# SQLite Connection
+DATABASE_PATH = str(config.SQLITE_PATH)
+
+# One connection per thread (sqlite3 connections are not shareable across threads)
+_local = threading.local()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    phone TEXT,
+    role TEXT NOT NULL DEFAULT 'user',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    location TEXT NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    image_path TEXT,
+    annotated_image_path TEXT,
+    status TEXT DEFAULT 'pending',
+    priority TEXT DEFAULT 'medium',
+    damage_percentage REAL,
+    total_damaged_area INTEGER,
+    total_detections INTEGER,
+    admin_notes TEXT,
+    previous_status TEXT,
+    image_phash TEXT,
+    duplicate_of INTEGER,
+    model_version TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    token TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS heatmap_cells (
+    precision INTEGER NOT NULL,
+    cell TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    damage_sum REAL NOT NULL DEFAULT 0,
+    high INTEGER NOT NULL DEFAULT 0,
+    medium INTEGER NOT NULL DEFAULT 0,
+    low INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER NOT NULL DEFAULT 0,
+    in_progress INTEGER NOT NULL DEFAULT 0,
+    resolved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (precision, cell)
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_user_id ON tickets (user_id);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status);
+CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets (created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS idx_heatmap_cells_box ON heatmap_cells (precision, lat, lon);
+"""
+
+# Full-text index over tickets, kept in sync by triggers (needs SQLite built with FTS5)
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+    title, description, location,
+    content='tickets', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets BEGIN
+    INSERT INTO tickets_fts (rowid, title, description, location)
+    VALUES (new.id, new.title, new.description, new.location);
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, title, description, location)
+    VALUES ('delete', old.id, old.title, old.description, old.location);
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_fts_update AFTER UPDATE OF title, description, location ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, title, description, location)
+    VALUES ('delete', old.id, old.title, old.description, old.location);
+    INSERT INTO tickets_fts (rowid, title, description, location)
+    VALUES (new.id, new.title, new.description, new.location);
+END;
+"""
+
+# bm25() column weights: title, description, location
+SEARCH_WEIGHTS = (5.0, 1.0, 3.0)
+
+HEATMAP_COUNTERS = ("count", "damage_sum", "high", "medium", "low", "pending", "in_progress", "resolved")
+
+# Columns added after the original schema: (table, column, type)
+ADDED_COLUMNS = [
+    ("tickets", "previous_status", "TEXT"),
+    ("tickets", "image_phash", "TEXT"),
+    ("tickets", "duplicate_of", "INTEGER"),
+    ("tickets", "model_version", "TEXT"),
+]
+
+def get_db():
+    """Get database connection for the current thread"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+    return conn
+
+def reset_connection():
+    """Forget the inherited connection (sqlite3 connections must not cross a fork)"""
+    _local.conn = None
+
+def hash_password(password):
+    """Hash password using SHA-256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def _format_ticket(row):
+    """Convert a ticket row to the dict shape returned by database.py"""
+    ticket = dict(row)
+    ticket["_id"] = str(ticket["id"])
+    return ticket
+
+def _add_missing_columns(db):
+    """Bring an existing road_damage.db up to the current schema"""
+    for table, column, column_type in ADDED_COLUMNS:
+        existing = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    db.commit()
+
+def _create_search_index(db):
+    """Create the FTS5 index, filling it from existing tickets the first time"""
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'tickets_fts'").fetchone()
+    try:
+        db.executescript(SEARCH_SCHEMA)
+    except sqlite3.OperationalError as e:
+        print(f"[WARNING] Full-text search unavailable, falling back to LIKE: {e}")
+        return
+    if not exists:
+        db.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')")
+        db.commit()
+
+def _normalise_timestamps(db):
+    """Rewrite ISO 'T'-separated timestamps to SQLite's 'YYYY-MM-DD HH:MM:SS' form
+
+    created_at / updated_at are compared as strings, and 'T' sorts after ' ',
+    so both forms in one table would make date filters skip or include rows.
+    """
+    for column in ("created_at", "updated_at"):
+        db.execute(f"UPDATE tickets SET {column} = replace({column}, 'T', ' ') WHERE {column} LIKE '%T%'")
+    db.commit()
+
+def _timestamp(value=None):
+    """Datetime in the same text form as CURRENT_TIMESTAMP, so stored values compare correctly"""
+    return (value or datetime.now()).isoformat(sep=' ')
+
+def _has_search_index(db):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'tickets_fts'").fetchone() is not None
+
+def init_db():
+    """Initialize database with tables and default admin"""
+    try:
+        db = get_db()
+        db.executescript(SCHEMA)
+        _add_missing_columns(db)
+        _normalise_timestamps(db)
+        _create_search_index(db)
+
+        # Create default admin if not exists
+        admin = db.execute("SELECT id FROM users WHERE username = ?", ("admin",)).fetchone()
+        if not admin:
+            db.execute(
+                "INSERT INTO users (username, email, password, full_name, phone, role) VALUES (?, ?, ?, ?, ?, ?)",
+                ("admin", "admin@roaddamage.com", hash_password('admin123'),
+                 "System Administrator", None, "admin")
+            )
+            db.commit()
+            print("[SUCCESS] Created default admin user (username: admin, password: admin123)")
+
+        print(f"[SUCCESS] SQLite database initialized successfully ({DATABASE_PATH})")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Database initialization failed: {e}")
+        return False
+
+def create_user(username, email, password, full_name, phone=None, role='user'):
+    """Create a new user"""
+    try:
+        db = get_db()
+        cursor = db.execute(
+            "INSERT INTO users (username, email, password, full_name, phone, role) VALUES (?, ?, ?, ?, ?, ?)",
+            (username, email, hash_password(password), full_name, phone, role)
+        )
+        db.commit()
+        return True, str(cursor.lastrowid)
+    except Exception as e:
+        return False, str(e)
+
+def verify_user(username, password):
+    """Verify user credentials"""
+    try:
+        db = get_db()
+        user = db.execute(
+            "SELECT * FROM users WHERE username = ? AND password = ?",
+            (username, hash_password(password))
+        ).fetchone()
+
+        if user:
+            return True, {
+                "id": str(user["id"]),
+                "username": user["username"],
+                "email": user["email"],
+                "full_name": user["full_name"],
+                "role": user["role"]
+            }
+        return False, None
+    except Exception as e:
+        print(f"[ERROR] User verification failed: {e}")
+        return False, None
+
+def create_session(user_id):
+    """Create authentication session"""
+    try:
+        db = get_db()
+        token = secrets.token_urlsafe(32)
+        expires_at = datetime.now().timestamp() + (24 * 60 * 60)  # 24 hours
+
+        db.execute(
+            "INSERT INTO sessions (user_id, token, expires_at) VALUES (?, ?, ?)",
+            (int(user_id), token, expires_at)
+        )
+        db.commit()
+        return token
+    except Exception as e:
+        print(f"[ERROR] Session creation failed: {e}")
+        return None
+
+def verify_session(token):
+    """Verify session token"""
+    try:
+        db = get_db()
+        user = db.execute(
+            """SELECT users.* FROM sessions JOIN users ON users.id = sessions.user_id
+               WHERE sessions.token = ? AND sessions.expires_at > ?""",
+            (token, datetime.now().timestamp())
+        ).fetchone()
+
+        if user:
+            return True, {
+                "user_id": str(user["id"]),
+                "username": user["username"],
+                "email": user["email"],
+                "full_name": user["full_name"],
+                "role": user["role"]
+            }
+        return False, None
+    except Exception as e:
+        print(f"[ERROR] Session verification failed: {e}")
+        return False, None
+
+def priority_for(damage_percentage):
+    """Ticket priority from the damaged share of the image"""
+    if damage_percentage > 30:
+        return 'high'
+    if damage_percentage > 15:
+        return 'medium'
+    return 'low'
+
+TICKET_INSERT = """INSERT INTO tickets (user_id, title, description, location, latitude, longitude,
+                   image_path, annotated_image_path, status, priority, damage_percentage,
+                   total_damaged_area, total_detections, admin_notes, image_phash, duplicate_of,
+                   model_version, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?)"""
+
+def _ticket_row(user_id, title, description, location, image_path=None,
+                annotated_image_path=None, damage_data=None, latitude=None, longitude=None,
+                image_phash=None, duplicate_of=None):
+    damage_percentage = damage_data.get('percentage_damage', 0) if damage_data else 0
+    total_damaged_area = damage_data.get('total_damaged_area', 0) if damage_data else 0
+    total_detections = damage_data.get('total_detections', 0) if damage_data else 0
+
+    now = _timestamp()
+    return (int(user_id), title, description, location, latitude, longitude,
+            image_path, annotated_image_path, priority_for(damage_percentage), damage_percentage,
+            total_damaged_area, total_detections, image_phash,
+            int(duplicate_of) if duplicate_of else None,
+            damage_data.get('model') if damage_data else None, now, now)
+
+def create_ticket(user_id, title, description, location, image_path=None,
+                 annotated_image_path=None, damage_data=None, latitude=None, longitude=None,
+                 image_phash=None, duplicate_of=None):
+    """Create a new ticket (duplicate_of links it to an earlier ticket of the same damage)"""
+    try:
+        db = get_db()
+        cursor = db.execute(TICKET_INSERT, _ticket_row(
+            user_id, title, description, location, image_path, annotated_image_path,
+            damage_data, latitude, longitude, image_phash, duplicate_of
+        ))
+        db.commit()
+        return str(cursor.lastrowid)
+    except Exception as e:
+        print(f"[ERROR] Ticket creation failed: {e}")
+        return None
+
+def create_tickets(tickets):
+    """Create many tickets in one transaction
+
+    Each item is a dict of create_ticket's arguments. Returns one id per item,
+    or None for items that failed; a failed item doesn't stop the others.
+    """
+    ids = []
+    try:
+        db = get_db()
+        for ticket in tickets:
+            try:
+                ids.append(str(db.execute(TICKET_INSERT, _ticket_row(**ticket)).lastrowid))
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"[ERROR] Ticket creation failed: {e}")
+                ids.append(None)
+        db.commit()
+        return ids
+    except Exception as e:
+        print(f"[ERROR] Bulk ticket creation failed: {e}")
+        return [None] * len(tickets)
+
+def get_user_tickets(user_id):
+    """Get all tickets for a user"""
+    try:
+        db = get_db()
+        rows = db.execute(
+            "SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC",
+            (int(user_id),)
+        ).fetchall()
+        return [_format_ticket(row) for row in rows]
+    except Exception as e:
+        print(f"[ERROR] Failed to get user tickets: {e}")
+        return []
+
+def get_all_tickets():
+    """Get all tickets (admin view)"""
+    try:
+        db = get_db()
+        rows = db.execute(
+            """SELECT tickets.*, users.username, users.email, users.full_name, users.phone
+               FROM tickets LEFT JOIN users ON users.id = tickets.user_id
+               ORDER BY tickets.created_at DESC"""
+        ).fetchall()
+        return [_format_ticket(row) for row in rows]
+    except Exception as e:
+        print(f"[ERROR] Failed to get all tickets: {e}")
+        return []
+
+def get_hashed_tickets(since):
+    """Analysed original (non-duplicate) tickets with an image hash created since a datetime"""
+    try:
+        db = get_db()
+        rows = db.execute(
+            """SELECT id, image_phash, latitude, longitude, location, created_at, annotated_image_path,
+                      damage_percentage, total_damaged_area, total_detections
+               FROM tickets
+               WHERE created_at >= ? AND image_phash IS NOT NULL AND annotated_image_path IS NOT NULL
+                 AND duplicate_of IS NULL""",
+            (_timestamp(since),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"[ERROR] Failed to get ticket hashes: {e}")
+        return []
+
+def _match_expression(text):
+    """User text -> FTS5 query: any of the words, each as a prefix (no FTS syntax passes through)"""
+    words = [w.replace('"', '') for w in text.split()]
+    return " OR ".join(f'"{w}"*' for w in words if w)
+
+def search_tickets(text, statuses=None, priorities=None, user_id=None, offset=0, limit=20):
+    """Full-text search over title, description and location, best matches first
+
+    Returns (tickets for this page, total number of matches).
+    """
+    try:
+        db = get_db()
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"tickets.status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if priorities:
+            clauses.append(f"tickets.priority IN ({', '.join('?' * len(priorities))})")
+            params.extend(priorities)
+        if user_id:
+            clauses.append("tickets.user_id = ?")
+            params.append(int(user_id))
+        
+        expression = _match_expression(text)
+        if not expression:
+            return [], 0
+        
+        if _has_search_index(db):
+            # CROSS JOIN pins the FTS match as the outer loop; otherwise SQLite may
+            # scan tickets by status and run MATCH once per row
+            source = "tickets_fts CROSS JOIN tickets ON tickets.id = tickets_fts.rowid"
+            score = f"-bm25(tickets_fts, {', '.join(map(str, SEARCH_WEIGHTS))})"
+            clauses.insert(0, "tickets_fts MATCH ?")
+            params.insert(0, expression)
+        else:
+            source = "tickets"
+            score = "0"
+            # The user's % and _ are literal characters, not wildcards
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.insert(0, "(tickets.title || ' ' || tickets.description || ' ' || tickets.location) LIKE ? ESCAPE '\\'")
+            params.insert(0, f"%{escaped}%")
+        where = " AND ".join(clauses)
+        
+        total = db.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+        rows = db.execute(
+            f"""SELECT tickets.*, users.username, users.email, users.full_name, users.phone, {score} AS score
+                FROM {source} LEFT JOIN users ON users.id = tickets.user_id
+                WHERE {where}
+                ORDER BY score DESC, tickets.created_at DESC
+                LIMIT ? OFFSET ?""",
+            (*params, limit, offset)
+        ).fetchall()
+        return [_format_ticket(row) for row in rows], total
+    except Exception as e:
+        print(f"[ERROR] Ticket search failed: {e}")
+        return [], 0
+
+def iter_tickets(start=None, end=None, statuses=None, priorities=None, batch_size=500):
+    """Stream tickets oldest-first for export, fetching batch_size rows at a time
+
+    start is inclusive and end exclusive (datetimes). statuses and priorities
+    are lists to match, or None for any.
+    """
+    db = get_db()
+    clauses, params = [], []
+    if start:
+        clauses.append("tickets.created_at >= ?")
+        params.append(_timestamp(start))
+    if end:
+        clauses.append("tickets.created_at < ?")
+        params.append(_timestamp(end))
+    if statuses:
+        clauses.append(f"tickets.status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if priorities:
+        clauses.append(f"tickets.priority IN ({', '.join('?' * len(priorities))})")
+        params.extend(priorities)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    cursor = db.execute(
+        f"""SELECT tickets.*, users.username, users.email, users.full_name, users.phone
+            FROM tickets LEFT JOIN users ON users.id = tickets.user_id
+            {where} ORDER BY tickets.created_at""",
+        params
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield _format_ticket(row)
+
+def get_tickets_to_rescore(model_version, after_id=None, limit=100):
+    """Next tickets (by id) with a stored image that model_version hasn't scored yet"""
+    db = get_db()
+    rows = db.execute(
+        """SELECT id, image_path, annotated_image_path, latitude, longitude, priority,
+                  damage_percentage, model_version
+           FROM tickets
+           WHERE id > ? AND image_path IS NOT NULL
+             AND (model_version IS NULL OR model_version != ?)
+           ORDER BY id LIMIT ?""",
+        (int(after_id or 0), model_version, limit)
+    ).fetchall()
+    return [_format_ticket(row) for row in rows]
+
+def update_ticket_scores(updates):
+    """Store re-scored damage fields for many tickets in one transaction
+
+    Each update is {"id", "damage_data", "annotated_image_path", "model_version"}.
+    Returns the ids of the tickets updated.
+    """
+    rows = []
+    for update in updates:
+        damage_data = update["damage_data"]
+        rows.append((
+            damage_data.get('percentage_damage', 0), damage_data.get('total_damaged_area', 0),
+            damage_data.get('total_detections', 0), priority_for(damage_data.get('percentage_damage', 0)),
+            update["annotated_image_path"], update["model_version"], int(update["id"])
+        ))
+    db = get_db()
+    try:
+        updated = []
+        for update, row in zip(updates, rows):
+            cursor = db.execute(
+                """UPDATE tickets SET damage_percentage = ?, total_damaged_area = ?, total_detections = ?,
+                       priority = ?, annotated_image_path = ?, model_version = ?
+                   WHERE id = ?""",
+                row
+            )
+            if cursor.rowcount:
+                updated.append(update["id"])
+        db.commit()
+        return updated
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Ticket re-score update failed: {e}")
+        return []
+
+def get_referenced_outputs(paths):
+    """Which of these annotated image paths some ticket still points to"""
+    paths = list(paths)
+    if not paths:
+        return set()
+    try:
+        db = get_db()
+        rows = db.execute(
+            f"""SELECT DISTINCT annotated_image_path FROM tickets
+                WHERE annotated_image_path IN ({", ".join("?" * len(paths))})""",
+            paths
+        ).fetchall()
+        return {row[0] for row in rows}
+    except Exception as e:
+        print(f"[ERROR] Failed to check annotated images: {e}")
+        return set(paths)  # keep everything when unsure
+
+def update_ticket_status(ticket_id, status, admin_notes=None):
+    """Update ticket status (the old status is kept in previous_status)
+
+    Returns (success, previous status) with the previous status read by the
+    same atomic write, so concurrent updates each see the transition they made.
+    """
+    try:
+        db = get_db()
+        now = _timestamp()
+
+        # Right-hand sides see the pre-update row, so previous_status gets the old status
+        if admin_notes is not None:
+            row = db.execute(
+                """UPDATE tickets SET previous_status = status, status = ?, admin_notes = ?, updated_at = ?
+                   WHERE id = ? RETURNING previous_status""",
+                (status, admin_notes, now, int(ticket_id))
+            ).fetchone()
+        else:
+            row = db.execute(
+                "UPDATE tickets SET previous_status = status, status = ?, updated_at = ? WHERE id = ? RETURNING previous_status",
+                (status, now, int(ticket_id))
+            ).fetchone()
+        db.commit()
+        if row is None:
+            return False, None
+        return True, row[0]
+    except Exception as e:
+        print(f"[ERROR] Failed to update ticket: {e}")
+        return False, None
+
+def get_ticket_by_id(ticket_id):
+    """Get single ticket by ID"""
+    try:
+        db = get_db()
+        row = db.execute(
+            """SELECT tickets.*, users.username, users.email, users.full_name, users.phone
+               FROM tickets LEFT JOIN users ON users.id = tickets.user_id
+               WHERE tickets.id = ?""",
+            (int(ticket_id),)
+        ).fetchone()
+        return _format_ticket(row) if row else None
+    except Exception as e:
+        print(f"[ERROR] Failed to get ticket: {e}")
+        return None
+
+def get_tickets_by_ids(ticket_ids):
+    """Tickets with the given IDs (in no particular order), in one query"""
+    try:
+        db = get_db()
+        ids = [int(ticket_id) for ticket_id in ticket_ids if str(ticket_id).isdigit()]
+        if not ids:
+            return []
+        rows = db.execute(
+            f"""SELECT tickets.*, users.username, users.email, users.full_name, users.phone
+                FROM tickets LEFT JOIN users ON users.id = tickets.user_id
+                WHERE tickets.id IN ({", ".join("?" * len(ids))})""",
+            ids
+        ).fetchall()
+        return [_format_ticket(row) for row in rows]
+    except Exception as e:
+        print(f"[ERROR] Failed to get tickets: {e}")
+        return []
+
+def get_dashboard_stats(user_id=None):
+    """Get dashboard statistics"""
+    try:
+        db = get_db()
+
+        if user_id:
+            # User stats
+            row = db.execute(
+                """SELECT COUNT(*) AS total,
+                          SUM(status = 'pending') AS pending,
+                          SUM(status = 'in_progress') AS in_progress,
+                          SUM(status = 'resolved') AS resolved
+                   FROM tickets WHERE user_id = ?""",
+                (int(user_id),)
+            ).fetchone()
+
+            return {
+                'total_tickets': row["total"],
+                'pending': row["pending"] or 0,
+                'in_progress': row["in_progress"] or 0,
+                'resolved': row["resolved"] or 0
+            }
+        else:
+            # Admin stats
+            row = db.execute(
+                """SELECT COUNT(*) AS total,
+                          SUM(status = 'pending') AS pending,
+                          SUM(status = 'in_progress') AS in_progress,
+                          SUM(status = 'resolved') AS resolved
+                   FROM tickets"""
+            ).fetchone()
+            users = db.execute("SELECT COUNT(*) FROM users WHERE role = 'user'").fetchone()[0]
+
+            return {
+                'total_tickets': row["total"],
+                'pending': row["pending"] or 0,
+                'in_progress': row["in_progress"] or 0,
+                'resolved': row["resolved"] or 0,
+                'total_users': users
+            }
+    except Exception as e:
+        print(f"[ERROR] Failed to get stats: {e}")
+        return {
+            'total_tickets': 0,
+            'pending': 0,
+            'in_progress': 0,
+            'resolved': 0,
+            'total_users': 0 if not user_id else None
+        }
+
+def apply_heatmap_delta(cells, delta):
+    """Add delta (counter -> change) to each (precision, cell, lat, lon) heatmap cell"""
+    return apply_heatmap_deltas([(cell, delta) for cell in cells])
+
+def apply_heatmap_deltas(cell_deltas):
+    """Apply [((precision, cell, lat, lon), delta)] in one transaction"""
+    try:
+        db = get_db()
+        columns = ", ".join(HEATMAP_COUNTERS)
+        placeholders = ", ".join("?" * len(HEATMAP_COUNTERS))
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in HEATMAP_COUNTERS)
+        db.executemany(
+            f"""INSERT INTO heatmap_cells (precision, cell, lat, lon, {columns})
+                VALUES (?, ?, ?, ?, {placeholders})
+                ON CONFLICT (precision, cell) DO UPDATE SET {updates}""",
+            [(precision, cell, lat, lon, *(delta.get(name, 0) for name in HEATMAP_COUNTERS))
+             for (precision, cell, lat, lon), delta in cell_deltas]
+        )
+        db.commit()
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to update heatmap: {e}")
+        return False
+
+def get_heatmap_cells(precision, south, west, north, east, limit=5000):
+    """Non-empty heatmap cells of one precision whose centre is inside the box"""
+    try:
+        db = get_db()
+        rows = db.execute(
+            """SELECT * FROM heatmap_cells
+               WHERE precision = ? AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ? AND count > 0
+               LIMIT ?""",
+            (precision, south, north, west, east, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"[ERROR] Failed to get heatmap: {e}")
+        return []
+
+def replace_heatmap(cells):
+    """Replace every heatmap cell (used by heatmap.py --rebuild)"""
+    db = get_db()
+    columns = ("precision", "cell", "lat", "lon") + HEATMAP_COUNTERS
+    with db:
+        db.execute("DELETE FROM heatmap_cells")
+        db.executemany(
+            f"INSERT INTO heatmap_cells ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [tuple(cell[name] for name in columns) for cell in cells]
+        )
+
+# Initialize database when run directly
+if __name__ == '__main__':
+    init_db()
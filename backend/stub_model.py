@@ -0,0 +1,116 @@
+"""Stub segmentation model for load and soak testing
+
+Implements the small part of the ultralytics YOLO interface that app.py uses
+(``predict`` returning results with ``boxes``, ``masks`` and ``plot``) so the
+API can be exercised without torch, ultralytics or model weights.
+"""
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class _Array:
+    """Stands in for a torch tensor: supports .cpu().numpy() and .tolist()"""
+
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+    def tolist(self):
+        return self._array.tolist()
+
+    def __len__(self):
+        return len(self._array)
+
+
+class StubBoxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = _Array(xyxy)
+        self.cls = _Array(cls)
+        self.conf = _Array(conf)
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class StubMasks:
+    def __init__(self, masks, polygons):
+        self.data = _Array(masks)
+        self.xy = polygons
+
+    def __len__(self):
+        return len(self.xy)
+
+
+class StubResult:
+    def __init__(self, orig_img, boxes, masks):
+        self.orig_img = orig_img
+        self.boxes = boxes
+        self.masks = masks
+
+    def plot(self, boxes=True, conf=True, labels=True):
+        """Draw mask outlines (and boxes) on a copy of the input image"""
+        annotated = self.orig_img.copy()
+        if self.masks is not None:
+            polygons = [poly.astype(np.int32) for poly in self.masks.xy]
+            cv2.polylines(annotated, polygons, True, (0, 0, 255), 2)
+        if boxes and self.boxes is not None:
+            for x1, y1, x2, y2 in self.boxes.xyxy.numpy().astype(int):
+                cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        return annotated
+
+
+class StubModel:
+    """Deterministic fake YOLO segmentation model
+
+    Every prediction returns two elliptical "damage" masks scaled to the
+    input image. ``latency_ms`` adds a sleep per image to mimic the cost of a
+    real forward pass.
+    """
+
+    task = "segment"
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+
+    def predict(self, source, conf=0.25, imgsz=640, verbose=False, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        return [self._predict_one(item) for item in sources]
+
+    __call__ = predict
+
+    def _predict_one(self, source):
+        if isinstance(source, (str, Path)):
+            img = cv2.imread(str(source))
+        else:
+            img = source
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        h, w = img.shape[:2]
+        ellipses = [
+            ((w // 3, h // 2), (w // 8, h // 10)),
+            ((2 * w // 3, 2 * h // 3), (w // 12, h // 14)),
+        ]
+        masks = np.zeros((len(ellipses), h, w), dtype=np.float32)
+        polygons = []
+        xyxy = []
+        for i, (center, axes) in enumerate(ellipses):
+            cv2.ellipse(masks[i], center, axes, 0, 0, 360, 1.0, -1)
+            polygons.append(cv2.ellipse2Poly(center, axes, 0, 0, 360, 10).astype(np.float32))
+            xyxy.append([center[0] - axes[0], center[1] - axes[1],
+                         center[0] + axes[0], center[1] + axes[1]])
+
+        boxes = StubBoxes(
+            np.array(xyxy, dtype=np.float32),
+            np.array([2.0, 0.0], dtype=np.float32),
+            np.array([0.81, 0.42], dtype=np.float32),
+        )
+        return StubResult(img, boxes, StubMasks(masks, polygons))
@@ -0,0 +1,353 @@
+"""
+Accuracy vs Latency Sweep
+Runs the segmentation model over a labelled image set for every combination
+of confidence threshold, inference size and available backend, and reports
+which settings are worth serving.
+
+Per configuration it records:
+  - mask mAP@0.5 and mAP@0.5:0.95 (per-instance masks, COCO-style 101-point AP)
+  - mean union-mask IoU per image (all damage vs all labelled damage)
+  - percentage_damage error against the labels, in percentage points
+  - single-stream throughput and p50 / p95 latency of model.predict
+
+It then prints the Pareto frontier: configurations that no other
+configuration beats on both accuracy (--objective) and p95 latency.
+
+Labels use the YOLO segmentation format the model is trained on:
+    data/val/images/0001.jpg
+    data/val/labels/0001.txt    class x1 y1 x2 y2 ... (normalised polygon per line)
+
+Backends are the weights found in models/ (bestyolov.pt on CPU and, when
+available, CUDA; bestyolov.onnx; the INT8 model from quantize_model.py).
+"stub" runs the stub model instead, to try the tool without weights.
+
+Usage:
+    python sweep_settings.py --images data/val/images
+    python sweep_settings.py --images data/val/images --conf 0.1 0.15 0.25 --sizes 480 640 --backends pytorch-cpu int8
+    python sweep_settings.py --images data/val/images --objective damage_error --output sweep.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import config
+from image_io import decode_image
+from quantize_model import list_images
+from resolution import letterbox_shape
+from segmentation import load_yolo_weights, calculate_damage_area
+
+DEFAULT_CONFS = [0.05, 0.1, 0.15, 0.25, 0.35, 0.5]
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+EVAL_SIZE = 640  # masks are compared at this long side, like the model sees them
+
+# Objective -> (report key, higher is better)
+OBJECTIVES = {
+    "map50": ("mask_map50", True),
+    "map50_95": ("mask_map50_95", True),
+    "mask_iou": ("mean_mask_iou", True),
+    "damage_error": ("damage_mae_pp", False),
+}
+
+
+# --------------------------
+# Backends & labels
+# --------------------------
+def discover_backends():
+    """{name: (weights path, device)} for every model file that exists"""
+    backends = {}
+    pt_path = config.MODELS_FOLDER / "bestyolov.pt"
+    if pt_path.exists():
+        backends["pytorch-cpu"] = (pt_path, "cpu")
+        try:
+            import torch
+            if torch.cuda.is_available():
+                backends["pytorch-cuda"] = (pt_path, "cuda:0")
+        except ImportError:
+            pass
+    if pt_path.with_suffix(".onnx").exists():
+        backends["onnx"] = (pt_path.with_suffix(".onnx"), "cpu")
+    if config.INT8_MODEL_PATH.exists():
+        backends["int8"] = (config.INT8_MODEL_PATH, "cpu")
+    return backends
+
+
+def load_model(name, backends, latency_ms):
+    if name == "stub":
+        from stub_model import StubModel
+        return StubModel(latency_ms=latency_ms), "cpu"
+    path, device = backends[name]
+    return load_yolo_weights(path), device
+
+
+def label_path(image_path):
+    """images/x.jpg -> labels/x.txt (ultralytics layout), else x.txt next to the image"""
+    parts = list(image_path.parts)
+    if "images" in parts:
+        i = len(parts) - 1 - parts[::-1].index("images")
+        parts[i] = "labels"
+        return Path(*parts).with_suffix(".txt")
+    return image_path.with_suffix(".txt")
+
+
+def load_labels(image_path, width, height):
+    """[(class, polygon in pixels)] from a YOLO segmentation label file"""
+    labels = []
+    path = label_path(image_path)
+    if not path.exists():
+        return labels
+    for line in path.read_text().splitlines():
+        values = line.split()
+        if len(values) < 5:
+            continue
+        cls, coords = int(values[0]), np.array(values[1:], dtype=np.float32)
+        if len(coords) == 4:  # detection label (cx cy w h): use the box as its polygon
+            cx, cy, w, h = coords
+            coords = np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy - h / 2,
+                               cx + w / 2, cy + h / 2, cx - w / 2, cy + h / 2], dtype=np.float32)
+        labels.append((cls, coords.reshape(-1, 2) * (width, height)))
+    return labels
+
+
+# --------------------------
+# Metrics
+# --------------------------
+def rasterize(polygons, shape, scale):
+    """One boolean mask per polygon at eval scale, flattened to (n, pixels)"""
+    h, w = max(1, round(shape[0] * scale)), max(1, round(shape[1] * scale))
+    masks = np.zeros((len(polygons), h, w), dtype=np.uint8)
+    for i, polygon in enumerate(polygons):
+        if len(polygon) >= 3:
+            cv2.fillPoly(masks[i], [np.rint(polygon * scale).astype(np.int32)], 1)
+    return masks.reshape(len(polygons), -1)
+
+
+def mask_ious(pred, gt):
+    """Pairwise IoU between flattened binary masks, shape (len(pred), len(gt))"""
+    if len(pred) == 0 or len(gt) == 0:
+        return np.zeros((len(pred), len(gt)))
+    pred, gt = pred.astype(np.float32), gt.astype(np.float32)
+    inter = pred @ gt.T
+    union = pred.sum(1)[:, None] + gt.sum(1)[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+
+
+def labelled_damage(labels, shape):
+    """percentage_damage of the labels, computed like calculate_damage_area"""
+    area = sum(cv2.contourArea(polygon.astype(np.float32)) for _, polygon in labels if len(polygon) >= 3)
+    return area / (shape[0] * shape[1]) * 100
+
+
+def average_precision(recall, precision):
+    """COCO 101-point interpolated AP"""
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    points = np.linspace(0, 1, 101)
+    idx = np.searchsorted(recall, points, side="left")
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in idx]))
+
+
+def mask_map(images):
+    """(mAP@0.5, mAP@0.5:0.95) over classes that have labels
+
+    images: [{"pred_cls", "pred_conf", "gt_cls", "ious"}] per image
+    """
+    classes = sorted({int(c) for image in images for c in image["gt_cls"]})
+    if not classes:
+        return 0.0, 0.0
+    aps = np.zeros((len(IOU_THRESHOLDS), len(classes)))
+    for ci, cls in enumerate(classes):
+        n_gt = sum(int(np.sum(image["gt_cls"] == cls)) for image in images)
+        preds = [(conf, i, p) for i, image in enumerate(images)
+                 for p, (c, conf) in enumerate(zip(image["pred_cls"], image["pred_conf"])) if c == cls]
+        preds.sort(key=lambda pred: -pred[0])
+        for ti, threshold in enumerate(IOU_THRESHOLDS):
+            matched = [np.zeros(len(image["gt_cls"]), dtype=bool) for image in images]
+            tp = np.zeros(len(preds))
+            for k, (_, i, p) in enumerate(preds):
+                image = images[i]
+                candidates = np.where((image["gt_cls"] == cls) & ~matched[i])[0]
+                if len(candidates) == 0:
+                    continue
+                best = candidates[np.argmax(image["ious"][p, candidates])]
+                if image["ious"][p, best] >= threshold:
+                    matched[i][best] = True
+                    tp[k] = 1
+            if not preds:
+                continue
+            cum_tp = np.cumsum(tp)
+            recall = cum_tp / n_gt
+            precision = cum_tp / np.arange(1, len(preds) + 1)
+            aps[ti, ci] = average_precision(recall, precision)
+    return float(aps[0].mean()), float(aps.mean())
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+# --------------------------
+# Sweep
+# --------------------------
+def evaluate_config(model, device, dataset, conf, size):
+    """Run one configuration over the dataset and return its metrics"""
+    model.predict(dataset[0]["load"](), conf=conf, imgsz=size, device=device, verbose=False)  # warm-up
+    latencies, per_image, ious, damage_errors = [], [], [], []
+    for item in dataset:
+        img = item["load"]()
+        imgsz = letterbox_shape(img.shape[0], img.shape[1], size)
+        started = time.perf_counter()
+        result = model.predict(img, conf=conf, imgsz=list(imgsz), device=device, verbose=False)[0]
+        latencies.append(time.perf_counter() - started)
+
+        polygons = list(result.masks.xy) if result.masks is not None else []
+        n = min(len(polygons), len(result.boxes) if result.boxes is not None else 0)
+        pred_cls = result.boxes.cls.cpu().numpy()[:n].astype(int) if n else np.zeros(0, dtype=int)
+        pred_conf = result.boxes.conf.cpu().numpy()[:n] if n else np.zeros(0)
+        pred_masks = rasterize(polygons[:n], img.shape, item["scale"])
+
+        per_image.append({"pred_cls": pred_cls, "pred_conf": pred_conf, "gt_cls": item["gt_cls"],
+                          "ious": mask_ious(pred_masks, item["gt_masks"])})
+        pred_union = pred_masks.any(0) if n else np.zeros(item["gt_union"].shape, dtype=bool)
+        union = np.logical_or(pred_union, item["gt_union"]).sum()
+        ious.append(1.0 if union == 0 else np.logical_and(pred_union, item["gt_union"]).sum() / union)
+        _, percentage_damage, _ = calculate_damage_area(result.masks, img.shape)
+        damage_errors.append(abs(percentage_damage - item["damage"]))
+        del result, img
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    map50, map50_95 = mask_map(per_image)
+    return {
+        "mask_map50": round(map50, 4),
+        "mask_map50_95": round(map50_95, 4),
+        "mean_mask_iou": round(float(np.mean(ious)), 4),
+        "damage_mae_pp": round(float(np.mean(damage_errors)), 3),
+        "damage_max_error_pp": round(float(np.max(damage_errors)), 3),
+        "throughput_ips": round(len(latencies) / sum(latencies), 2) if sum(latencies) else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 1),
+        "p95_ms": round(percentile(latencies_ms, 95), 1),
+    }
+
+
+def load_dataset(images, max_size):
+    """Labels and ground-truth masks per image; pixels are decoded again per run"""
+    dataset = []
+    for path in images:
+        decoded = decode_image(path, target_size=max_size)
+        shape = decoded.pixels.shape
+        labels = load_labels(path, shape[1], shape[0])
+        scale = min(1.0, EVAL_SIZE / max(shape[:2]))
+        gt_masks = rasterize([polygon for _, polygon in labels], shape, scale)
+        dataset.append({
+            "load": lambda path=path: decode_image(path, target_size=max_size).pixels,
+            "scale": scale,
+            "gt_cls": np.array([cls for cls, _ in labels], dtype=int),
+            "gt_masks": gt_masks,
+            "gt_union": gt_masks.any(0) if len(labels) else np.zeros(gt_masks.shape[1], dtype=bool),
+            "damage": labelled_damage(labels, shape),
+        })
+    return dataset
+
+
+def pareto_frontier(rows, objective):
+    """Rows not dominated on (objective, p95 latency), sorted by latency"""
+    key, higher_is_better = OBJECTIVES[objective]
+    sign = 1 if higher_is_better else -1
+    frontier = []
+    for row in rows:
+        dominated = any(
+            other is not row
+            and sign * other[key] >= sign * row[key] and other["p95_ms"] <= row["p95_ms"]
+            and (sign * other[key] > sign * row[key] or other["p95_ms"] < row["p95_ms"])
+            for other in rows
+        )
+        if not dominated:
+            frontier.append(row)
+    return sorted(frontier, key=lambda row: row["p95_ms"])
+
+
+def print_table(rows, frontier):
+    print(f"\n   {'backend':<14}{'conf':>6}{'size':>6}{'mAP50':>8}{'mAP50-95':>10}{'IoU':>7}"
+          f"{'dmg err':>9}{'img/s':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        mark = "*" if row in frontier else " "
+        print(f" {mark} {row['backend']:<14}{row['conf']:>6.2f}{row['size']:>6}{row['mask_map50']:>8.3f}"
+              f"{row['mask_map50_95']:>10.3f}{row['mean_mask_iou']:>7.3f}{row['damage_mae_pp']:>9.2f}"
+              f"{row['throughput_ips']:>8.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep confidence / input size / backend against labelled images")
+    parser.add_argument("--images", required=True, help="Folder of labelled images (labels in ../labels)")
+    parser.add_argument("--limit", type=int, default=None, help="Use only the first N images")
+    parser.add_argument("--conf", type=float, nargs="+", default=DEFAULT_CONFS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=config.INFERENCE_SIZES)
+    parser.add_argument("--backends", nargs="+", help="Backends to run (default: every one found in models/)")
+    parser.add_argument("--objective", choices=list(OBJECTIVES), default="map50",
+                        help="Accuracy metric for the Pareto frontier")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="Forward-pass time of the stub backend")
+    parser.add_argument("--output", help="Write all results and the frontier as JSON to this file")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ROAD DAMAGE DETECTION - ACCURACY / LATENCY SWEEP")
+    print("=" * 60)
+
+    found = discover_backends()
+    names = args.backends or list(found)
+    unknown = [name for name in names if name != "stub" and name not in found]
+    if unknown:
+        print(f"[ERROR] Backend(s) not available: {', '.join(unknown)} (found: {', '.join(found) or 'none'}, or stub)")
+        return 1
+    if not names:
+        print("[ERROR] No model weights found in models/ (pass --backends stub to try the tool)")
+        return 1
+
+    images = list_images(args.images, args.limit)
+    if not images:
+        print(f"[ERROR] No images in {args.images}")
+        return 1
+    dataset = load_dataset(images, max(args.sizes))
+    labelled = sum(len(item["gt_cls"]) > 0 for item in dataset)
+    print(f"[INFO] {len(dataset)} images ({labelled} with damage labels), "
+          f"{len(args.conf)} thresholds x {len(args.sizes)} sizes x {len(names)} backends")
+
+    rows = []
+    for name in names:
+        model, device = load_model(name, found, args.stub_latency_ms)
+        for size in args.sizes:
+            for conf in args.conf:
+                print(f"[INFO] {name} conf={conf} size={size}...")
+                rows.append({"backend": name, "conf": conf, "size": size,
+                             **evaluate_config(model, device, dataset, conf, size)})
+        del model
+
+    frontier = pareto_frontier(rows, args.objective)
+    print_table(rows, frontier)
+    print(f"\n[RESULT] Pareto frontier ({OBJECTIVES[args.objective][0]} vs p95 latency), marked * above:")
+    for row in frontier:
+        print(f"   {row['backend']} conf={row['conf']} size={row['size']}: "
+              f"{OBJECTIVES[args.objective][0]}={row[OBJECTIVES[args.objective][0]]}, p95={row['p95_ms']} ms")
+
+    from app import CONF_THRESHOLD
+    print(f"[INFO] Currently served: conf={CONF_THRESHOLD}, sizes={config.INFERENCE_SIZES}, "
+          f"MODEL_VARIANT={config.MODEL_VARIANT}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "images": len(dataset),
+                "objective": args.objective,
+                "results": rows,
+                "frontier": frontier,
+            }, f, indent=2)
+        print(f"[SUCCESS] Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Production WSGI entry point
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (see gunicorn.conf.py) this module is imported once in the
+gunicorn master: the database is initialised and the model loaded there, then
+inherited copy-on-write by every forked worker.
+"""
+from app import create_app
+
+# Warm-up runs per worker after fork (see post_fork in gunicorn.conf.py)
+app = create_app(warmup=False)
@@ -5,6 +5,7 @@ import { useRouter } from 'next/navigation'
 import { useAuth } from '@/contexts/AuthContext'
 import { Loader2, Users, AlertCircle, MapPin, Calendar, Edit } from 'lucide-react'
 import axios from 'axios'
+import { subscribeToTicketEvents, upsertTicket, applyStatsDelta } from '@/lib/events'
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000'
 
@@ -33,6 +34,7 @@ export default function AdminDashboard() {
   const [stats, setStats] = useState<any>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
+  const [eventCursor, setEventCursor] = useState<string | null>(null)
   const [editingTicket, setEditingTicket] = useState<number | null>(null)
   const [updateForm, setUpdateForm] = useState({ status: '', admin_notes: '' })
 
@@ -50,6 +52,19 @@ export default function AdminDashboard() {
     fetchDashboardData()
   }, [isAuthenticated, isAdmin, token])
 
+  // Live updates: apply ticket/stat deltas pushed by the server instead of re-fetching
+  useEffect(() => {
+    if (!token || !eventCursor) return
+
+    return subscribeToTicketEvents<Ticket>(token, eventCursor, {
+      onTicket: (event) => {
+        setTickets((current) => upsertTicket(current, event.ticket!))
+        setStats((current: any) => applyStatsDelta(current, event.stats_delta))
+      },
+      onReset: () => fetchDashboardData()
+    })
+  }, [token, eventCursor])
+
   const fetchDashboardData = async () => {
     try {
       setLoading(true)
@@ -66,6 +81,7 @@ export default function AdminDashboard() {
 
       if (ticketsResponse.data.success) {
         setTickets(ticketsResponse.data.tickets)
+        setEventCursor(ticketsResponse.data.cursor)
       }
 
       if (statsResponse.data.success) {
@@ -88,9 +104,11 @@ export default function AdminDashboard() {
       })
 
       if (response.data.success) {
-        await fetchDashboardData()
         setEditingTicket(null)
         setUpdateForm({ status: '', admin_notes: '' })
+        // With live events the updated ticket and stats arrive through the
+        // stream; without them (no cursor) re-fetch
+        if (!eventCursor) fetchDashboardData()
       }
     } catch (err: any) {
       setError('Failed to update ticket')
@@ -5,6 +5,7 @@ import { useRouter } from 'next/navigation'
 import { useAuth } from '@/contexts/AuthContext'
 import { Loader2, Plus, MapPin, Calendar, AlertCircle } from 'lucide-react'
 import axios from 'axios'
+import { subscribeToTicketEvents, upsertTicket, applyStatsDelta } from '@/lib/events'
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000'
 
@@ -28,6 +29,7 @@ export default function UserDashboard() {
   const [stats, setStats] = useState<any>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
+  const [eventCursor, setEventCursor] = useState<string | null>(null)
 
   useEffect(() => {
     if (!isAuthenticated) {
@@ -38,6 +40,19 @@ export default function UserDashboard() {
     fetchDashboardData()
   }, [isAuthenticated, token])
 
+  // Live updates: apply ticket/stat deltas pushed by the server instead of re-fetching
+  useEffect(() => {
+    if (!token || !eventCursor) return
+
+    return subscribeToTicketEvents<Ticket>(token, eventCursor, {
+      onTicket: (event) => {
+        setTickets((current) => upsertTicket(current, event.ticket!))
+        setStats((current: any) => applyStatsDelta(current, event.stats_delta))
+      },
+      onReset: () => fetchDashboardData()
+    })
+  }, [token, eventCursor])
+
   const fetchDashboardData = async () => {
     try {
       setLoading(true)
@@ -54,6 +69,7 @@ export default function UserDashboard() {
 
       if (ticketsResponse.data.success) {
         setTickets(ticketsResponse.data.tickets)
+        setEventCursor(ticketsResponse.data.cursor)
       }
 
       if (statsResponse.data.success) {
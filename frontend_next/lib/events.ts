@@ -0,0 +1,56 @@
+import { API_URL } from './api'
+
+export interface TicketEvent<T = any> {
+  id: string
+  type: 'ticket_created' | 'ticket_updated' | 'ticket_rescored' | 'ticket_edited' | 'reset'
+  ticket?: T
+  stats_delta?: Record<string, number>
+}
+
+interface TicketEventHandlers<T> {
+  onTicket: (event: TicketEvent<T>) => void
+  // The server can't replay from our cursor; re-fetch everything once
+  onReset: () => void
+}
+
+// Subscribe to live ticket events (server-sent events). `cursor` comes from
+// the ticket list response so nothing between the fetch and the subscribe is
+// missed; it is null when the server has no live feed, so callers should
+// re-fetch after their own changes instead. Returns a function that closes the
+// stream.
+export function subscribeToTicketEvents<T>(
+  token: string,
+  cursor: string | null,
+  handlers: TicketEventHandlers<T>
+): () => void {
+  const params = new URLSearchParams({ token })
+  if (cursor) params.set('cursor', cursor)
+
+  // EventSource reconnects by itself and resumes with Last-Event-ID
+  const source = new EventSource(`${API_URL}/api/events/stream?${params}`)
+  source.onmessage = (message) => {
+    const event: TicketEvent<T> = JSON.parse(message.data)
+    if (event.type === 'reset') {
+      handlers.onReset()
+    } else if (event.ticket) {
+      handlers.onTicket(event)
+    }
+  }
+
+  return () => source.close()
+}
+
+// Insert or replace a ticket, keeping the list newest-first
+export function upsertTicket<T extends { id: number | string; created_at: string }>(tickets: T[], ticket: T): T[] {
+  const others = tickets.filter((t) => String(t.id) !== String(ticket.id))
+  return [ticket, ...others].sort((a, b) => (a.created_at < b.created_at ? 1 : -1))
+}
+
+export function applyStatsDelta(stats: any, delta?: Record<string, number>) {
+  if (!stats || !delta) return stats
+  const next = { ...stats }
+  for (const [key, change] of Object.entries(delta)) {
+    if (key in next) next[key] = (next[key] || 0) + change
+  }
+  return next
+}